@@ -0,0 +1,307 @@
+# audit.py
+"""
+Audit log (the `entries` table) writer.
+
+AUDIT_MODE=transactional (default)
+    write_entries(conn, rows) inserts on the caller's connection; the rows
+    commit (or roll back) together with the change they describe.
+
+AUDIT_MODE=queued
+    rows go to an in-process queue once the change they describe has
+    committed (api.log_entries / submit_entries). A background thread
+    flushes them as multi-row INSERTs when AUDIT_FLUSH_ROWS are waiting or
+    AUDIT_FLUSH_INTERVAL seconds have passed, on its own connection. If the
+    database is unavailable, the batch is appended (fsynced) to
+    AUDIT_SPILL_PATH and replayed once writes succeed again; the queue
+    itself is bounded by AUDIT_QUEUE_MAX and overflows to the spill file as
+    well.
+    Entries are at-least-once: a crash between a replay's commit and the
+    spill file's removal replays it again on the next start. Rows still
+    in memory when the process is killed (not shut down) are lost.
+"""
+import glob, json, os, threading, time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from changes import bump_versions
+from migrations import has_column
+
+AUDIT_MODE = os.getenv("AUDIT_MODE", "transactional").lower()
+AUDIT_FLUSH_ROWS = int(os.getenv("AUDIT_FLUSH_ROWS", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "100000"))
+AUDIT_SPILL_PATH = os.getenv("AUDIT_SPILL_PATH", "audit_spill.ndjson")
+
+# (event, item_id, from_holder, to_holder, by_user, notes)
+Entry = Tuple[str, str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+def _bump_entries(conn) -> None:
+    # queued flushes only; transactional writers stamp "entries" with their
+    # own tables, in one bump (see changes.bump_versions)
+    if has_column(conn, "table_versions", "version"):
+        bump_versions(conn, ["entries"])
+
+def write_entries(conn, rows: Sequence[Entry]) -> None:
+    """
+    Insert entries on conn (no commit). event_time is the server's NOW().
+    """
+    if not rows:
+        return
+    cur = conn.cursor()
+    try:
+        cur.executemany("""
+            INSERT INTO entries(event_time, event, item_id, from_holder, to_holder, by_user, notes)
+            VALUES (NOW(), %s, %s, %s, %s, %s, %s)
+        """, list(rows))
+    finally:
+        cur.close()
+
+def _write_timed(conn, rows: Sequence[tuple]) -> None:
+    # queued rows carry the time they were recorded, not the time of the flush
+    cur = conn.cursor()
+    try:
+        cur.executemany("""
+            INSERT INTO entries(event_time, event, item_id, from_holder, to_holder, by_user, notes)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, list(rows))
+    finally:
+        cur.close()
+    _bump_entries(conn)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+class AuditWriter:
+    def __init__(self, connect: Callable[[], Any], flush_rows: int = AUDIT_FLUSH_ROWS,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL, queue_max: int = AUDIT_QUEUE_MAX,
+                 spill_path: str = AUDIT_SPILL_PATH):
+        self._connect = connect
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self.queue_max = queue_max
+        self.spill_path = spill_path
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "flush_time_total_ms": 0.0,
+            "flush_time_max_ms": 0.0,
+            "flush_time_last_ms": 0.0,
+            "last_error": None,
+        }
+
+    # ---- producer side ----
+    def submit(self, rows: Sequence[Entry]) -> None:
+        now = datetime.now()
+        timed = [(now,) + tuple(r) for r in rows]
+        overflow: List[tuple] = []
+        with self._cond:
+            self._stats["enqueued"] += len(timed)
+            room = max(0, self.queue_max - len(self._queue))
+            self._queue.extend(timed[:room])
+            overflow = timed[room:]
+            if len(self._queue) >= self.flush_rows:
+                self._cond.notify()
+        if overflow:
+            self._spill(overflow, quiet=True)
+
+    # ---- lifecycle ----
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Flush what is queued (spilling it if the database is down) and stop.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---- background thread ----
+    def _run(self) -> None:
+        self._recover_orphans()
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._queue) < self.flush_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                stopping = self._stopping
+            self._drain(everything=stopping)
+            if stopping:
+                return
+            self._replay_spill()
+
+    def _drain(self, everything: bool) -> None:
+        # one batch per tick unless more than a batch is waiting (or shutting down)
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            if not self._flush(batch):
+                self._spill(batch)
+                if everything:
+                    self._spill(self._take(all_rows=True))
+                return
+            if not everything and len(self._queue) < self.flush_rows:
+                return
+
+    def _take(self, all_rows: bool = False) -> List[tuple]:
+        with self._cond:
+            n = len(self._queue) if all_rows else min(len(self._queue), self.flush_rows)
+            return [self._queue.popleft() for _ in range(n)]
+
+    def _flush(self, batch: List[tuple]) -> bool:
+        t0 = time.perf_counter()
+        try:
+            conn = self._connect()
+            try:
+                _write_timed(conn, batch)
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            with self._cond:
+                self._stats["flush_failures"] += 1
+                self._stats["last_error"] = repr(e)
+            print("AUDIT_FLUSH_ERROR:", repr(e))
+            return False
+        ms = (time.perf_counter() - t0) * 1000.0
+        with self._cond:
+            s = self._stats
+            s["written"] += len(batch)
+            s["flushes"] += 1
+            s["flush_time_total_ms"] += ms
+            s["flush_time_max_ms"] = max(s["flush_time_max_ms"], ms)
+            s["flush_time_last_ms"] = ms
+            s["last_error"] = None
+        return True
+
+    # ---- spill file ----
+    def _spill(self, batch: List[tuple], quiet: bool = False) -> None:
+        if not batch:
+            return
+        lines = "".join(
+            json.dumps([r[0].strftime("%Y-%m-%d %H:%M:%S.%f")] + list(r[1:]), ensure_ascii=False) + "\n"
+            for r in batch
+        )
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        with self._cond:
+            self._stats["spilled"] += len(batch)
+        if not quiet:   # queue overflow spills on every request; counted only
+            print(f"AUDIT_SPILLED: {len(batch)} entries to {self.spill_path}")
+
+    def _replay_file(self, path: str) -> bool:
+        rows: List[tuple] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    r = json.loads(line)
+                    rows.append((datetime.strptime(r[0], "%Y-%m-%d %H:%M:%S.%f"),) + tuple(r[1:]))
+                except (ValueError, IndexError) as e:
+                    print("AUDIT_SPILL_BAD_LINE:", repr(e))
+        try:
+            conn = self._connect()
+            try:
+                for start in range(0, len(rows), self.flush_rows):
+                    _write_timed(conn, rows[start:start + self.flush_rows])
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            with self._cond:
+                self._stats["last_error"] = repr(e)
+            print("AUDIT_REPLAY_ERROR:", repr(e))
+            return False
+        os.remove(path)
+        with self._cond:
+            self._stats["replayed"] += len(rows)
+            self._stats["last_error"] = None
+        print(f"AUDIT_REPLAYED: {len(rows)} entries from {path}")
+        return True
+
+    def _replay_spill(self) -> None:
+        if not os.path.exists(self.spill_path):
+            return
+        mine = f"{self.spill_path}.{os.getpid()}.replaying"
+        with self._spill_lock:
+            if not os.path.exists(mine):
+                try:
+                    os.replace(self.spill_path, mine)
+                except FileNotFoundError:
+                    return   # another worker took it
+        self._replay_file(mine)
+
+    def _recover_orphans(self) -> None:
+        # replay files left by a worker that died mid-replay
+        for path in glob.glob(f"{glob.escape(self.spill_path)}.*.replaying"):
+            try:
+                pid = int(path.rsplit(".", 2)[-2])
+            except ValueError:
+                continue
+            if pid == os.getpid() or not _pid_alive(pid):
+                mine = f"{self.spill_path}.{os.getpid()}.replaying"
+                try:
+                    if path != mine:
+                        os.replace(path, mine)
+                except FileNotFoundError:
+                    continue
+                self._replay_file(mine)
+
+    # ---- metrics ----
+    def pending_spill(self) -> int:
+        try:
+            return os.path.getsize(self.spill_path)
+        except OSError:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            s = dict(self._stats)
+            depth = len(self._queue)
+        flushes = s["flushes"] or 1
+        s.update({
+            "mode": "queued",
+            "running": self._thread is not None,
+            "queue_depth": depth,
+            "queue_max": self.queue_max,
+            "flush_rows": self.flush_rows,
+            "flush_interval_s": self.flush_interval,
+            "spill_pending_bytes": self.pending_spill(),
+            "flush_time_avg_ms": round(s["flush_time_total_ms"] / flushes, 3),
+        })
+        for k in ("flush_time_total_ms", "flush_time_max_ms", "flush_time_last_ms"):
+            s[k] = round(s[k], 3)
+        return s
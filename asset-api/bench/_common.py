@@ -0,0 +1,272 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Benchmarks run against a scratch database (BENCH_DB_NAME, default
+"assetvault_bench") on the server configured by the usual DB_* variables.
+The scratch database is dropped and recreated by seed_* helpers, so never
+point BENCH_DB_NAME at real data.
+
+    cd asset-api
+    python bench/bench_item_photos.py
+"""
+import os, sys, time, random, statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "assetvault_bench")
+os.environ["DB_NAME"] = BENCH_DB_NAME  # api / db modules must only ever see the scratch db
+
+import mysql.connector  # noqa: E402
+import db  # noqa: E402
+
+SIZES = [int(x) for x in os.getenv("BENCH_SIZES", "1000,10000,100000").split(",")]
+
+# Minimal copies of the production tables (see asset-pwa/assetvault.sql)
+SCHEMA = [
+    """
+    CREATE TABLE items (
+      id INT NOT NULL AUTO_INCREMENT,
+      item_id VARCHAR(64) NOT NULL,
+      name VARCHAR(255) NOT NULL,
+      quantity INT NOT NULL DEFAULT 0,
+      serial_no VARCHAR(128) NOT NULL,
+      model_no VARCHAR(128) NULL,
+      department VARCHAR(128) NULL,
+      owner VARCHAR(128) NULL,
+      transfer_from VARCHAR(128) NULL,
+      transfer_to VARCHAR(128) NULL,
+      notes TEXT NULL,
+      photo_url VARCHAR(255) NULL,
+      created_by VARCHAR(50) NULL,
+      created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+      category VARCHAR(64) NULL,
+      status ENUM('in_stock','assigned','repair','lost','retired') DEFAULT 'in_stock',
+      current_holder_id INT NULL,
+      PRIMARY KEY (id),
+      UNIQUE KEY uq_items_serial (serial_no),
+      KEY department (department),
+      KEY owner (owner),
+      KEY idx_items_created_at (created_at),
+      KEY idx_items_status (status)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE item_photos (
+      id INT NOT NULL AUTO_INCREMENT,
+      item_id_int INT NOT NULL,
+      item_id VARCHAR(64) NOT NULL,
+      photo_url VARCHAR(255) NOT NULL,
+      created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+      PRIMARY KEY (id),
+      KEY idx_item_photos_item (item_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE departments (
+      id INT NOT NULL AUTO_INCREMENT,
+      name VARCHAR(128) NOT NULL,
+      PRIMARY KEY (id),
+      UNIQUE KEY name (name)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE people (
+      id INT NOT NULL AUTO_INCREMENT,
+      emp_code VARCHAR(32) NULL,
+      full_name VARCHAR(128) NOT NULL,
+      department_id INT NULL,
+      email VARCHAR(128) NULL,
+      phone VARCHAR(32) NULL,
+      status ENUM('active','inactive','left') DEFAULT 'active',
+      created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+      PRIMARY KEY (id),
+      UNIQUE KEY emp_code (emp_code),
+      KEY department_id (department_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE assignments (
+      id INT NOT NULL AUTO_INCREMENT,
+      item_id_int INT NOT NULL,
+      serial_no VARCHAR(128) NOT NULL,
+      person_id INT NOT NULL,
+      assigned_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      due_back_date DATE NULL,
+      returned_at DATETIME NULL,
+      notes TEXT NULL,
+      assigned_by VARCHAR(64) NULL,
+      item_id VARCHAR(64) NULL,
+      PRIMARY KEY (id),
+      KEY idx_asg_item_active (returned_at),
+      KEY idx_asg_person (person_id, assigned_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE entries (
+      id INT NOT NULL AUTO_INCREMENT,
+      event_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      event VARCHAR(32) NOT NULL,
+      item_id VARCHAR(64) NOT NULL,
+      from_holder VARCHAR(128) NULL,
+      to_holder VARCHAR(128) NULL,
+      by_user VARCHAR(64) NULL,
+      notes TEXT NULL,
+      PRIMARY KEY (id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE service_records (
+      id INT NOT NULL AUTO_INCREMENT,
+      item_id VARCHAR(64) NOT NULL,
+      service_date DATETIME NOT NULL,
+      serviced TINYINT(1) NOT NULL DEFAULT 1,
+      location VARCHAR(120) NULL,
+      notes TEXT NULL,
+      next_due_date DATE NULL,
+      created_by VARCHAR(64) NULL,
+      created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      PRIMARY KEY (id),
+      KEY idx_item_date (item_id, service_date),
+      KEY idx_svc_next_due (next_due_date)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE users (
+      id INT NOT NULL AUTO_INCREMENT,
+      username VARCHAR(50) NOT NULL,
+      password_hash VARCHAR(255) NOT NULL,
+      full_name VARCHAR(100) NULL,
+      role ENUM('admin','staff') NOT NULL DEFAULT 'staff',
+      PRIMARY KEY (id),
+      UNIQUE KEY username (username)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+]
+
+DEPARTMENTS = ["Finance", "HR", "IT", "Operations", "Sales", "Legal", "Warehouse", "Front Office"]
+KINDS = [("Laptop", "Dell Latitude 5440 Laptop"), ("Desktop", "HP ProDesk 400 Desktop"),
+         ("Printer", "Canon LBP Printer"), ("UPS", "APC Back-UPS 650"), ("Other", "Logitech Dock")]
+FIRST = ["Amal", "Nimal", "Kasun", "Sachini", "Dilani", "Ruwan", "Ishara", "Tharindu", "Hiruni", "Chamara"]
+LAST = ["Perera", "Fernando", "Silva", "Jayasinghe", "Bandara", "Wickramasinghe", "Gunawardena"]
+
+def reset_db():
+    """
+    Drop and recreate the scratch database with an empty schema.
+    """
+    cfg = dict(db.DB_CONFIG)
+    cfg.pop("database", None)
+    conn = mysql.connector.connect(**cfg)
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS `{BENCH_DB_NAME}`")
+    cur.execute(f"CREATE DATABASE `{BENCH_DB_NAME}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    cur.execute(f"USE `{BENCH_DB_NAME}`")
+    for ddl in SCHEMA:
+        cur.execute(ddl)
+    conn.commit()
+    cur.close(); conn.close()
+
+def item_row(i: int, rnd: random.Random):
+    cat, base = KINDS[i % len(KINDS)]
+    dept = DEPARTMENTS[rnd.randrange(len(DEPARTMENTS))]
+    owner = f"{FIRST[rnd.randrange(len(FIRST))]} {LAST[rnd.randrange(len(LAST))]}"
+    return (
+        i + 1, f"IT-{cat[:3].upper()}-{i:06d}", f"{base} #{i}", 1,
+        f"SN{i:08d}X", f"MDL-{i % 97:03d}", dept, owner,
+        f"asset {i} {cat.lower()} for {dept.lower()}", "bench", cat,
+    )
+
+def seed(n_items: int, photos_per_item: int = 2, n_people: int = 0, seed_value: int = 42):
+    """
+    Reset the scratch database and insert n_items items (+ photos / people).
+    """
+    reset_db()
+    rnd = random.Random(seed_value)
+    conn = db.connect_raw()
+    cur = conn.cursor()
+    batch = []
+    for i in range(n_items):
+        batch.append(item_row(i, rnd))
+        if len(batch) >= 2000:
+            _insert_items(cur, batch); batch = []
+    if batch:
+        _insert_items(cur, batch)
+
+    photos = []
+    for i in range(n_items):
+        for p in range(photos_per_item):
+            photos.append((i + 1, f"IT-{KINDS[i % len(KINDS)][0][:3].upper()}-{i:06d}", f"/uploads/{i:06d}_{p}.jpg"))
+            if len(photos) >= 5000:
+                cur.executemany("INSERT INTO item_photos (item_id_int, item_id, photo_url) VALUES (%s,%s,%s)", photos)
+                photos = []
+    if photos:
+        cur.executemany("INSERT INTO item_photos (item_id_int, item_id, photo_url) VALUES (%s,%s,%s)", photos)
+
+    cur.executemany("INSERT INTO departments (name) VALUES (%s)", [(d,) for d in DEPARTMENTS])
+    people = []
+    for i in range(n_people):
+        name = f"{FIRST[rnd.randrange(len(FIRST))]} {LAST[rnd.randrange(len(LAST))]}"
+        people.append((f"E{i:05d}", name, rnd.randrange(len(DEPARTMENTS)) + 1))
+    if people:
+        cur.executemany("INSERT INTO people (emp_code, full_name, department_id) VALUES (%s,%s,%s)", people)
+    conn.commit()
+    cur.close(); conn.close()
+
+def _insert_items(cur, rows):
+    cur.executemany("""
+        INSERT INTO items
+          (id, item_id, name, quantity, serial_no, model_no, department, owner,
+           notes, created_by, created_at, category)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW() - INTERVAL id SECOND,%s)
+    """, rows)
+
+class CountingConnection:
+    """
+    Wraps a connection and counts statements executed through its cursors.
+    """
+    def __init__(self, conn):
+        self._conn = conn
+        self.queries = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *a, **kw):
+        real = self._conn.cursor(*a, **kw)
+        owner = self
+
+        class _Cur:
+            def __getattr__(self, name):
+                return getattr(real, name)
+
+            def __iter__(self):
+                return iter(real)
+
+            def execute(self, *ea, **ekw):
+                owner.queries += 1
+                return real.execute(*ea, **ekw)
+
+            def executemany(self, *ea, **ekw):
+                owner.queries += 1
+                return real.executemany(*ea, **ekw)
+
+        return _Cur()
+
+def timed(fn, repeat: int = 3):
+    """
+    Run fn() `repeat` times; return (median seconds, last result).
+    """
+    samples, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), result
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    line = "  ".join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for r in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(r, widths)))
@@ -0,0 +1,73 @@
+"""
+POST /assignments/batch vs the single-item endpoints.
+
+For each BENCH_OPS size n: seeds 2n items and a few hundred people, then
+  - assigns / transfers / returns items 0..n-1 one call at a time
+    (create_assignment, transfer_assignment_api, return_assignment_api),
+  - does the same for items n..2n-1 with one batch call per phase,
+and reports operations per second for both.
+"""
+import os, time
+
+from _common import seed, db, print_table
+
+import api
+import migrations
+
+OPS = [int(x) for x in os.getenv("BENCH_OPS", "100,1000,5000").split(",")]
+PEOPLE = 300
+USER = {"username": "bench"}
+
+def item_ids(conn, start: int, n: int):
+    cur = conn.cursor()
+    cur.execute("SELECT item_id FROM items ORDER BY id LIMIT %s OFFSET %s", (n, start))
+    ids = [r[0] for r in cur.fetchall()]
+    cur.close()
+    return ids
+
+def active_ids(conn, ids):
+    found = api._batch_active_assignments(conn, ids)
+    conn.rollback()
+    return {k: int(v["id"]) for k, v in found.items()}
+
+def single(conn, ids):
+    t0 = time.perf_counter()
+    for k, item_id in enumerate(ids):
+        api.create_assignment(api.AssignmentCreate(item_id=item_id, person_id=1 + k % PEOPLE), USER, conn)
+    for k, item_id in enumerate(ids):
+        api.transfer_assignment_api(api.AssignmentTransfer(item_id=item_id, to_person_id=1 + (k + 1) % PEOPLE),
+                                    USER, conn)
+    active = active_ids(conn, ids)
+    for item_id in ids:
+        api.return_assignment_api(api.AssignmentReturn(assignment_id=active[item_id.lower()], item_id=item_id),
+                                  USER, conn)
+    return 3 * len(ids) / (time.perf_counter() - t0)
+
+def batched(conn, ids):
+    phases = [
+        [{"op": "assign", "item_id": i, "person_id": 1 + k % PEOPLE} for k, i in enumerate(ids)],
+        [{"op": "transfer", "item_id": i, "to_person_id": 1 + (k + 1) % PEOPLE} for k, i in enumerate(ids)],
+        [{"op": "return", "item_id": i} for i in ids],
+    ]
+    t0 = time.perf_counter()
+    for ops in phases:
+        report = api.assignments_batch(api.AssignmentBatch(operations=ops), "abort", USER, conn)
+        assert isinstance(report, dict) and report["failed"] == 0, report
+    return 3 * len(ids) / (time.perf_counter() - t0)
+
+def main():
+    results = []
+    for n in OPS:
+        seed(2 * n, photos_per_item=0, n_people=PEOPLE)
+        conn = db.connect_raw()
+        try:
+            migrations.migrate(conn, log=lambda *a: None)
+            one = single(conn, item_ids(conn, 0, n))
+            many = batched(conn, item_ids(conn, n, n))
+            results.append((n, f"{one:.0f}", f"{many:.0f}", f"{many / one:.1f}x"))
+        finally:
+            conn.close()
+    print_table(["items", "single ops/s", "batch ops/s", "speedup"], results)
+
+if __name__ == "__main__":
+    main()
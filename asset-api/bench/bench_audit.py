@@ -0,0 +1,85 @@
+"""
+Audit entries: the old two-commit log_entry vs transactional vs queued mode.
+
+Each "operation" is a one-row UPDATE on items plus one entries row:
+  two-commit     UPDATE, COMMIT, INSERT entry, COMMIT (what log_entry did)
+  transactional  UPDATE, INSERT entry, COMMIT
+  queued         UPDATE, COMMIT; entry handed to AuditWriter
+Reports operations per second over BENCH_AUDIT_OPS operations, and for
+queued mode the time until the writer has flushed everything.
+"""
+import os, tempfile, time
+
+from _common import seed, db, print_table
+
+import audit
+
+OPS = int(os.getenv("BENCH_AUDIT_OPS", "5000"))
+ENTRY = ("assign", "IT-LAP-000001", None, "Bench Person", "bench", "bench")
+
+def touch(cur, k: int):
+    cur.execute("UPDATE items SET quantity = quantity + 1 WHERE id = %s", (1 + k % 1000,))
+
+def two_commit(conn):
+    cur = conn.cursor()
+    for k in range(OPS):
+        touch(cur, k)
+        conn.commit()
+        audit.write_entries(conn, [ENTRY])
+        conn.commit()
+    cur.close()
+
+def transactional(conn):
+    cur = conn.cursor()
+    for k in range(OPS):
+        touch(cur, k)
+        audit.write_entries(conn, [ENTRY])
+        conn.commit()
+    cur.close()
+
+def queued(conn, writer):
+    cur = conn.cursor()
+    for k in range(OPS):
+        touch(cur, k)
+        conn.commit()
+        writer.submit([ENTRY])
+    cur.close()
+
+def entry_count(conn) -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM entries")
+    n = int(cur.fetchone()[0])
+    cur.close()
+    conn.commit()
+    return n
+
+def main():
+    seed(1000, photos_per_item=0)
+    conn = db.connect_raw()
+    results = []
+    try:
+        for name, fn in (("two-commit", two_commit), ("transactional", transactional)):
+            t0 = time.perf_counter()
+            fn(conn)
+            secs = time.perf_counter() - t0
+            results.append((name, f"{OPS / secs:.0f}", "-", "-"))
+
+        writer = audit.AuditWriter(db.connect_raw, spill_path=os.path.join(tempfile.gettempdir(), "assetvault_bench_spill.ndjson"))
+        writer.start()
+        start = entry_count(conn)
+        t0 = time.perf_counter()
+        queued(conn, writer)
+        secs = time.perf_counter() - t0
+        while entry_count(conn) < start + OPS:
+            time.sleep(0.01)
+        drained = time.perf_counter() - t0
+        stats = writer.stats()
+        writer.stop()
+        results.append(("queued", f"{OPS / secs:.0f}", f"{drained:.2f}",
+                        f"{stats['flush_time_avg_ms']:.1f} / {stats['flush_time_max_ms']:.1f}"))
+    finally:
+        conn.close()
+    print_table(["mode", "ops/s", "all entries written after s", "flush avg / max ms"], results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+POST /items/bulk vs one POST /items per row (what the Admin CSV import
+used to do).
+
+For each BENCH_SIZES n: starts from an empty items table, imports n rows
+as CSV (all creates), then re-imports the same file with new quantities
+(all updates). The per-row baseline replays create_item's statements
+(SELECT 1, INSERT, commit, re-fetch) for up to BENCH_PER_ROW_MAX rows and
+reports its rate; it does not scale with n.
+"""
+import io, os, random, time, types
+
+from _common import SIZES, seed, db, print_table, DEPARTMENTS, KINDS
+
+import api
+import migrations
+
+PER_ROW_MAX = int(os.getenv("BENCH_PER_ROW_MAX", "2000"))
+USER = {"username": "bench"}
+
+def make_csv(n: int, qty: int = 1) -> bytes:
+    rnd = random.Random(11)
+    out = io.StringIO()
+    out.write("item_id,name,quantity,serial_no,model_no,department,category\n")
+    for i in range(n):
+        cat, base = KINDS[i % len(KINDS)]
+        dept = DEPARTMENTS[rnd.randrange(len(DEPARTMENTS))]
+        out.write(f"BLK-{i:07d},{base} #{i},{qty},BSN{i:08d},MDL-{i % 97:03d},{dept},{cat}\n")
+    return out.getvalue().encode()
+
+def upload(data: bytes):
+    return types.SimpleNamespace(file=io.BytesIO(data), filename="bench.csv", content_type="text/csv")
+
+def bulk(conn, data: bytes, dry_run: bool = False):
+    report = api.bulk_import_items(upload(data), None, dry_run, "abort", USER, conn)
+    assert isinstance(report, dict) and report["failed"] == 0, report
+    return report
+
+def per_row(conn, n: int) -> float:
+    # create_item's round trips, one transaction per row
+    cur = conn.cursor()
+    t0 = time.perf_counter()
+    for i in range(n):
+        item_id = f"ONE-{i:07d}"
+        cur.execute("SELECT 1 FROM items WHERE item_id=%s", (item_id,))
+        cur.fetchall()
+        cur.execute("""
+            INSERT INTO items (item_id, name, quantity, serial_no, department, created_by, created_at, category)
+            VALUES (%s,%s,1,%s,%s,'bench',NOW(),'Other')
+        """, (item_id, f"Row item #{i}", f"OSN{i:08d}", DEPARTMENTS[i % len(DEPARTMENTS)]))
+        conn.commit()
+        cur.execute(f"SELECT {api.SELECT_LIST} FROM items WHERE item_id=%s", (item_id,))
+        cur.fetchall()
+        cur.execute("SELECT item_id, id, photo_url FROM item_photos WHERE item_id IN (%s)", (item_id,))
+        cur.fetchall()
+    secs = time.perf_counter() - t0
+    cur.close()
+    return n / secs if secs > 0 else 0.0
+
+def main():
+    api.item_feed.sync = lambda *a, **kw: None   # no in-process index to refresh here
+    results = []
+    for n in SIZES:
+        seed(0, photos_per_item=0)
+        conn = db.connect_raw()
+        try:
+            migrations.migrate(conn, log=lambda *a: None)
+            data = make_csv(n)
+            dry = bulk(conn, data, dry_run=True)
+            created = bulk(conn, data)
+            assert created["created"] == n
+            updated = bulk(conn, make_csv(n, qty=2))
+            assert updated["updated"] == n
+            one = per_row(conn, min(n, PER_ROW_MAX))
+            results.append((n, dry["rows_per_sec"], created["rows_per_sec"],
+                            updated["rows_per_sec"], f"{one:.0f}",
+                            f"{created['timing_ms']['total'] / 1000:.2f}"))
+        finally:
+            conn.close()
+    print_table(["rows", "dry-run rows/s", "create rows/s", "update rows/s",
+                 "per-row POST rows/s", "bulk create s"], results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Thundering herd on the aggregate endpoints: BENCH_CONCURRENCY (default 50)
+simultaneous requests computing independently vs through SingleFlight.
+
+Seeds BENCH_SIZES items (every third one assigned) and, for the legacy
+dashboard overview (LIKE scans), the rollup summary and the full services
+overview, reports wall time for the whole burst and how many times the
+query set actually ran. Each thread has its own connection, like request
+threads taking one from the pool.
+"""
+import os, threading, time
+
+from _common import SIZES, seed, db, print_table
+
+os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+os.environ.setdefault("ENTRIES_ARCHIVE_INTERVAL", "0")
+
+import api  # noqa: E402
+import migrations  # noqa: E402
+import rollups  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "50"))
+COMPUTE = {
+    "dashboard_overview": api.compute_dashboard_overview,
+    "dashboard_summary": api.compute_dashboard_summary,
+    "services_overview": api.list_service_overview,
+}
+
+def assign_some():
+    conn = db.connect_raw()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO assignments (item_id_int, serial_no, person_id, assigned_at, item_id)
+        SELECT id, serial_no, 1, NOW(), item_id FROM items WHERE id % 3 = 0
+    """)
+    conn.commit()
+    migrations.migrate(conn, log=lambda *a: None)
+    migrations.load_capabilities(conn)
+    rollups.rebuild_rollup(conn)
+    api.rebuild_service_state(conn)
+    conn.commit()
+    cur.close(); conn.close()
+
+def burst(fn, flights=None):
+    conns = [db.connect_raw() for _ in range(CONCURRENCY)]
+    runs = [0]
+    lock = threading.Lock()
+    start = threading.Barrier(CONCURRENCY + 1)
+
+    def counted(conn):
+        with lock:
+            runs[0] += 1
+        return fn(conn)
+
+    def worker(conn):
+        start.wait()
+        if flights is None:
+            counted(conn)
+        else:
+            flights.do("k", lambda: counted(conn))
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in conns]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    for c in conns:
+        c.close()
+    return wall, runs[0]
+
+def main():
+    rows = []
+    for n in SIZES:
+        seed(n, photos_per_item=0, n_people=10)
+        assign_some()
+        for name, fn in COMPUTE.items():
+            wall, runs = burst(fn)
+            rows.append((n, name, "independent", f"{wall * 1000:.0f}", runs))
+            wall, runs = burst(fn, SingleFlight(ttl=0))
+            rows.append((n, name, "single-flight", f"{wall * 1000:.0f}", runs))
+    print(f"{CONCURRENCY} concurrent requests per burst\n")
+    print_table(["items", "endpoint", "mode", "burst ms", "query sets run"], rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Repeat page loads: full GET vs If-None-Match revalidation (304).
+
+Seeds BENCH_SIZES items (plus 2000 people) and, for the endpoints the PWA
+calls on every page visit, reports median latency and statements executed
+for a plain GET and for a conditional GET carrying the ETag of the previous
+response. In-process (TestClient), auth dependency overridden.
+"""
+import os
+
+from _common import SIZES, seed, db, timed, print_table, CountingConnection
+
+os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+os.environ.setdefault("ENTRIES_ARCHIVE_INTERVAL", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+import migrations  # noqa: E402
+import rollups  # noqa: E402
+
+ENDPOINTS = ["/dashboard/summary", "/departments", "/people?limit=100",
+             "/items?limit=50", "/services/overview"]
+REPEAT = int(os.getenv("BENCH_REPEAT", "9"))
+
+def main():
+    results = []
+    for n in SIZES:
+        seed(n, photos_per_item=1, n_people=2000)
+        conn = db.connect_raw()
+        migrations.migrate(conn, log=lambda *a: None)
+        migrations.load_capabilities(conn)
+        rollups.rebuild_rollup(conn)
+        conn.commit()
+        counting = CountingConnection(conn)
+        api.app.dependency_overrides[api.get_current_user] = lambda: {"username": "bench", "role": "admin"}
+        api.app.dependency_overrides[api.get_db] = lambda: counting
+        client = TestClient(api.app)
+        try:
+            for url in ENDPOINTS:
+                first = client.get(url)
+                etag = first.headers.get("etag")
+                counting.queries = 0
+                full, _ = timed(lambda: client.get(url), REPEAT)
+                q_full = counting.queries // REPEAT
+                counting.queries = 0
+                cond, r = timed(lambda: client.get(url, headers={"If-None-Match": etag}), REPEAT)
+                q_cond = counting.queries // REPEAT
+                results.append((n, url, f"{full * 1000:.1f}", q_full,
+                                f"{cond * 1000:.1f}", q_cond, r.status_code))
+        finally:
+            api.app.dependency_overrides.clear()
+            conn.close()
+    print_table(["items", "endpoint", "full ms", "queries", "304 ms", "queries", "status"], results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+GET /dashboard/summary: live aggregates over items + assignment history
+vs the dashboard_rollup table.
+
+Seeds BENCH_SIZES items with BENCH_ASSIGNMENTS_PER_ITEM historical
+assignments each (the last one still active for every third item) and
+reports median latency of both variants plus one full rollup rebuild.
+"""
+import os
+
+from _common import SIZES, seed, db, timed, print_table
+
+import api
+import migrations
+import rollups
+
+ASSIGNMENTS_PER_ITEM = int(os.getenv("BENCH_ASSIGNMENTS_PER_ITEM", "5"))
+
+def seed_assignments(n_items: int):
+    conn = db.connect_raw()
+    cur = conn.cursor()
+    cur.execute("SELECT id, item_id, serial_no FROM items")
+    items = cur.fetchall()
+    batch = []
+    for pk, item_id, serial in items:
+        for k in range(ASSIGNMENTS_PER_ITEM):
+            active = k == ASSIGNMENTS_PER_ITEM - 1 and pk % 3 == 0
+            batch.append((pk, serial, 1 + k, None if active else "2024-01-01 00:00:00", item_id))
+            if len(batch) >= 5000:
+                _insert(cur, batch); batch = []
+    if batch:
+        _insert(cur, batch)
+    conn.commit()
+    cur.close(); conn.close()
+
+def _insert(cur, rows):
+    cur.executemany("""
+        INSERT INTO assignments (item_id_int, serial_no, person_id, assigned_at, returned_at, item_id)
+        VALUES (%s, %s, %s, NOW(), %s, %s)
+    """, rows)
+
+def summary_live(conn):
+    # the pre-rollup implementation's three heavy statements
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("SELECT COUNT(*) AS total_items FROM items")
+        cur.fetchall()
+        cur.execute("SELECT COUNT(DISTINCT a.item_id) AS in_use FROM assignments a WHERE a.returned_at IS NULL")
+        cur.fetchall()
+        for group in ("category", "department, category"):
+            dept = "COALESCE(i.department, 'Unassigned') AS department," if "department" in group else ""
+            cur.execute(f"""
+                SELECT {dept}
+                  {rollups.CATEGORY_SQL} AS category,
+                  COUNT(*) AS total,
+                  SUM(CASE WHEN a.item_id IS NOT NULL AND a.returned_at IS NULL THEN 1 ELSE 0 END) AS in_use
+                FROM items i
+                LEFT JOIN assignments a ON a.item_id = i.item_id
+                GROUP BY {group}
+            """)
+            cur.fetchall()
+    finally:
+        cur.close()
+
+def main():
+    results = []
+    for n in SIZES:
+        seed(n, photos_per_item=0)
+        seed_assignments(n)
+        conn = db.connect_raw()
+        try:
+            migrations.migrate(conn, log=lambda *a: None)
+            rebuild_secs, info = timed(lambda: rollups.rebuild_rollup(conn), repeat=1)
+            live_secs, _ = timed(lambda: summary_live(conn))
+            rollup_secs, data = timed(lambda: api.dashboard_summary(None, conn))
+            assert data["overall"]["total_items"] == n
+            results.append((n, n * ASSIGNMENTS_PER_ITEM, f"{live_secs * 1000:.1f}",
+                            f"{rollup_secs * 1000:.2f}", f"{rebuild_secs * 1000:.1f}", info["rows"]))
+        finally:
+            conn.close()
+    print_table(["items", "assignments", "live ms", "rollup ms", "rebuild ms", "rollup rows"], results)
+
+if __name__ == "__main__":
+    main()
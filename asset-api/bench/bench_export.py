@@ -0,0 +1,63 @@
+"""
+GET /items/export (streamed) vs dumping the fleet through GET /items.
+
+For each BENCH_SIZES n, reports wall time and peak Python heap
+(tracemalloc) of
+  - the legacy full listing: fetchall + ItemOut per row + photos + JSON,
+  - the export in CSV, NDJSON and XLSX, consumed chunk by chunk the way
+    the ASGI server sends it.
+The export's peak should stay flat as n grows; the listing's grows with n.
+"""
+import json, time, tracemalloc
+
+from _common import SIZES, seed, db, print_table
+
+import api
+from exports import stream_export
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    secs = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return secs, peak, size
+
+def legacy_listing():
+    conn = api.pool.connect()
+    try:
+        items = api.list_items_page(conn, None, [], [], None, None)
+        return len(json.dumps([i.model_dump() for i in items], default=str))
+    finally:
+        conn.close()
+
+def export(fmt: str):
+    query = api.ExportQuery(api.item_export_sql([]), ())
+    total = 0
+    for chunk in stream_export(fmt, api.ITEM_EXPORT_COLUMNS, query.rows(), sheet="items"):
+        total += len(chunk)
+    return total
+
+def mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f}"
+
+def main():
+    results = []
+    for n in SIZES:
+        seed(n, photos_per_item=1)
+        api.pool.dispose()
+        row = [n]
+        secs, peak, _ = measure(legacy_listing)
+        row += [f"{secs:.2f}", mb(peak)]
+        for fmt in ("csv", "ndjson", "xlsx"):
+            secs, peak, size = measure(lambda: export(fmt))
+            row += [f"{secs:.2f}", mb(peak), mb(size)]
+        results.append(tuple(row))
+    print_table(["items", "list s", "list peak MB",
+                 "csv s", "csv peak MB", "csv MB",
+                 "ndjson s", "ndjson peak MB", "ndjson MB",
+                 "xlsx s", "xlsx peak MB", "xlsx MB"], results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+List endpoint encoding: per-row pydantic models + FastAPI response_model
+validation vs the RowEncoder / orjson fast path (fastjson.py).
+
+Seeds BENCH_SIZES items (one photo each, 2000 people, one entries row per
+item, every 50th item assigned to person 1) and, for the rows each endpoint
+returns, reports:
+  - legacy  CPU ms to build models and serialize them the way FastAPI does
+            (serialize_response against the route's response_model + JSONResponse)
+  - fast    CPU ms for RowEncoder dicts + fastjson.dumps
+  - e2e     median wall ms of the whole request through TestClient (SQL,
+            encoding, ASGI), which now takes the fast path
+Output equality is checked separately by check_fast_json.py.
+"""
+import os, time
+
+from _common import SIZES, seed, db, timed, print_table
+
+os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+os.environ.setdefault("ENTRIES_ARCHIVE_INTERVAL", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+import fastjson  # noqa: E402
+import migrations  # noqa: E402
+from check_fast_json import (  # noqa: E402
+    legacy_assignment, legacy_body, legacy_entry, legacy_item, legacy_person, legacy_photo,
+)
+
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+PAGE = 1000
+
+def add_history():
+    conn = db.connect_raw()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO entries (event_time, event, item_id, to_holder, by_user, notes)
+        SELECT created_at, 'created', item_id, owner, 'bench', notes FROM items
+    """)
+    cur.execute("""
+        INSERT INTO assignments (item_id_int, serial_no, person_id, assigned_at, item_id)
+        SELECT id, serial_no, 1, created_at, item_id FROM items WHERE id % 50 = 0
+    """)
+    conn.commit()
+    migrations.migrate(conn, log=lambda *a: None)
+    migrations.load_capabilities(conn)
+    conn.commit()
+    cur.close(); conn.close()
+
+def fetch(conn, sql):
+    cur = conn.cursor()
+    cur.execute(sql)
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def cpu_ms(fn):
+    best = None
+    for _ in range(REPEAT):
+        t0 = time.process_time()
+        fn()
+        t = time.process_time() - t0
+        best = t if best is None or t < best else best
+    return f"{best * 1000:.1f}"
+
+def cases(conn):
+    items = fetch(conn, f"SELECT {api.SELECT_LIST} FROM items ORDER BY created_at DESC, name")
+    photos = {}
+    for pid, url, item_id in fetch(conn, "SELECT id, photo_url, item_id FROM item_photos ORDER BY item_id, id"):
+        photos.setdefault(item_id, []).append((pid, url))
+
+    def legacy_items():
+        objs = [legacy_item(r) for r in items]
+        for o in objs:
+            o.photos = [legacy_photo(*p) for p in photos.get(o.item_id, [])]
+        return legacy_body("/items", objs)
+
+    def fast_items():
+        out = api.ITEM_ROW.rows(items)
+        for d in out:
+            d["photos"] = [api.PHOTO_ROW.row(p) for p in photos.get(d["item_id"], [])]
+        return fastjson.dumps(out)
+
+    yield "/items", len(items), legacy_items, fast_items
+
+    people = fetch(conn, f"""
+        SELECT p.id, p.emp_code, p.full_name, p.department_id, p.email, p.phone, p.status, d.name
+        FROM people p LEFT JOIN departments d ON d.id = p.department_id
+        ORDER BY p.full_name, p.id LIMIT {PAGE}""")
+    yield (f"/people?limit={PAGE}", len(people),
+           lambda: legacy_body("/people", [legacy_person(r) for r in people]),
+           lambda: fastjson.dumps(api.PERSON_ROW.rows(people)))
+
+    entries = fetch(conn, f"SELECT {', '.join(api.ENTRY_COLUMNS)} FROM entries "
+                          f"ORDER BY event_time DESC, id DESC LIMIT {PAGE}")
+    yield (f"/entries?limit={PAGE}", len(entries),
+           lambda: legacy_body("/entries", [legacy_entry(r) for r in entries]),
+           lambda: fastjson.dumps(api.ENTRY_ROW.rows(entries)))
+
+    hist = fetch(conn, """
+        SELECT a.id, a.item_id, i.name, a.person_id, a.assigned_at, a.due_back_date, a.returned_at, a.notes
+        FROM assignments a LEFT JOIN items i ON i.item_id = a.item_id
+        WHERE a.person_id = 1 ORDER BY a.assigned_at DESC, a.id DESC""")
+    yield ("/people/1/history", len(hist),
+           lambda: legacy_body("/people/{person_id}/history", [legacy_assignment(r) for r in hist]),
+           lambda: fastjson.dumps(api.ASSIGNMENT_ROW.rows(hist)))
+
+def main():
+    results = []
+    for n in SIZES:
+        seed(n, photos_per_item=1, n_people=2000)
+        add_history()
+        conn = db.connect_raw()
+        api.app.dependency_overrides[api.get_current_user] = lambda: {"username": "bench", "role": "admin"}
+        api.app.dependency_overrides[api.get_db] = lambda: conn
+        client = TestClient(api.app)
+        try:
+            for url, count, legacy, fast in cases(conn):
+                assert legacy() == fast(), url
+                e2e, r = timed(lambda: client.get(url), REPEAT)
+                assert r.status_code == 200, (url, r.status_code)
+                results.append((n, url, count, cpu_ms(legacy), cpu_ms(fast),
+                                 f"{e2e * 1000:.1f}", f"{len(r.content) / 1024:.0f}"))
+        finally:
+            api.app.dependency_overrides.clear()
+            conn.close()
+    print(f"encoder: {'orjson' if fastjson.orjson else 'json'}\n")
+    print_table(["items", "endpoint", "rows", "legacy cpu ms", "fast cpu ms", "e2e ms", "KB"], results)
+
+if __name__ == "__main__":
+    main()
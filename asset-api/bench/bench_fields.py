@@ -0,0 +1,68 @@
+"""
+Sparse fieldsets and the columnar format on GET /items.
+
+Seeds BENCH_SIZES items (two photos each) and fetches one page of
+BENCH_PAGE (default 1000) items as:
+  - full            every ItemOut field plus photos (what the grid got before)
+  - directory       ?fields=item_id,name,serial_no,department,photo_thumb_url
+  - columnar        ?format=columnar, every field
+  - dir+columnar    both
+Reports median request ms (in-process TestClient), body and gzip size, and
+the time json.loads takes on the body, as a stand-in for the client's
+parse cost.
+"""
+import gzip, json, os, time
+
+from _common import SIZES, seed, db, timed, print_table
+
+os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+os.environ.setdefault("ENTRIES_ARCHIVE_INTERVAL", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+import migrations  # noqa: E402
+
+PAGE = int(os.getenv("BENCH_PAGE", "1000"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "7"))
+DIRECTORY = "item_id,name,serial_no,department,photo_thumb_url"
+VARIANTS = [
+    ("full", {}),
+    ("directory", {"fields": DIRECTORY}),
+    ("columnar", {"format": "columnar"}),
+    ("dir+columnar", {"fields": DIRECTORY, "format": "columnar"}),
+]
+
+def parse_ms(body: bytes) -> float:
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        json.loads(body)
+    return (time.perf_counter() - t0) / REPEAT * 1000
+
+def main():
+    results = []
+    for n in SIZES:
+        seed(n, photos_per_item=2)
+        conn = db.connect_raw()
+        migrations.migrate(conn, log=lambda *a: None)
+        migrations.load_capabilities(conn)
+        conn.commit()
+        api.app.dependency_overrides[api.get_current_user] = lambda: {"username": "bench", "role": "admin"}
+        api.app.dependency_overrides[api.get_db] = lambda: conn
+        client = TestClient(api.app)
+        try:
+            for name, params in VARIANTS:
+                q = {"limit": PAGE, **params}
+                secs, r = timed(lambda: client.get("/items", params=q), REPEAT)
+                assert r.status_code == 200, (name, r.status_code, r.text[:200])
+                body = r.content
+                results.append((n, name, f"{secs * 1000:.1f}", f"{len(body) / 1024:.0f}",
+                                f"{len(gzip.compress(body)) / 1024:.0f}", f"{parse_ms(body):.2f}"))
+        finally:
+            api.app.dependency_overrides.clear()
+            conn.close()
+    print(f"GET /items?limit={PAGE}\n")
+    print_table(["items", "variant", "request ms", "KB", "gzip KB", "parse ms"], results)
+
+if __name__ == "__main__":
+    main()
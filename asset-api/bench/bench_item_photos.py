@@ -0,0 +1,50 @@
+"""
+GET /items photo loading: per-row query (N+1) vs the batched loader.
+
+Reports statement count and median latency for building the full
+List[ItemOut] at BENCH_SIZES items (default 1k, 10k, 100k).
+"""
+from _common import SIZES, seed, db, CountingConnection, timed, print_table
+
+import api
+
+def list_items_n_plus_one(conn):
+    cur = conn.cursor()
+    cur.execute(f"SELECT {api.SELECT_LIST} FROM items ORDER BY created_at DESC, name")
+    rows = cur.fetchall()
+    cur.close()
+    data = []
+    for r in rows:
+        obj = api._row_to_item(r)
+        pc = conn.cursor()
+        pc.execute("SELECT id, photo_url FROM item_photos WHERE item_id=%s ORDER BY id", (obj.item_id,))
+        obj.photos = [api.PhotoOut(id=p[0], photo_url=p[1]) for p in pc.fetchall()]
+        pc.close()
+        data.append(obj)
+    return data
+
+def list_items_batched(conn):
+    cur = conn.cursor()
+    cur.execute(f"SELECT {api.SELECT_LIST} FROM items ORDER BY created_at DESC, name")
+    rows = cur.fetchall()
+    cur.close()
+    return api.attach_item_photos(conn, [api._row_to_item(r) for r in rows])
+
+def main():
+    results = []
+    for n in SIZES:
+        seed(n, photos_per_item=2)
+        raw = db.connect_raw()
+        try:
+            for label, fn in (("n+1", list_items_n_plus_one), ("batched", list_items_batched)):
+                conn = CountingConnection(raw)
+                repeat = 1 if (label == "n+1" and n >= 100000) else 3
+                secs, data = timed(lambda: fn(conn), repeat=repeat)
+                assert len(data) == n and all(len(o.photos) == 2 for o in data)
+                results.append((n, label, conn.queries // repeat, f"{secs * 1000:.1f}"))
+        finally:
+            raw.close()
+    print_table(["items", "loader", "queries", "median ms"], results)
+
+if __name__ == "__main__":
+    main()
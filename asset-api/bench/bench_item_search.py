@@ -0,0 +1,70 @@
+"""
+/items/search: four-column leading-wildcard LIKE vs the in-process index.
+
+Seeds BENCH_SEARCH_SIZE items (default 100k) and, for a set of typical
+Directory queries, reports median latency of
+  - like:   the old SQL (full scan, all matches)
+  - index:  item_index.search() for the first page of 50 + PK fetch of that page
+plus index build time and memory, and the /items/search-lite typeahead
+path (item_id / serial_no / name, top 20, memory only).
+"""
+import os, time, tracemalloc
+from _common import seed, db, timed, print_table
+
+import api
+
+N = int(os.getenv("BENCH_SEARCH_SIZE", "100000"))
+QUERIES = ["lap", "laptop", "SN00012", "IT-DSK-0042", "finance desktop", "perera", "mdl-013", "canon printer"]
+
+LIKE_SQL = f"""
+    SELECT {api.SELECT_LIST} FROM items
+    WHERE name LIKE %s OR item_id LIKE %s OR serial_no LIKE %s OR model_no LIKE %s
+    ORDER BY created_at DESC, name
+"""
+
+def like_search(conn, q):
+    like = f"%{q}%"
+    cur = conn.cursor()
+    cur.execute(LIKE_SQL, (like, like, like, like))
+    rows = cur.fetchall()
+    cur.close()
+    return len(rows)
+
+def index_search(conn, q):
+    total, hits = api.item_index.search(q, offset=0, limit=50)
+    ids = [api.item_index.attrs(d)["id"] for d, _ in hits]
+    api.fetch_items_by_pk(conn, ids)
+    return total
+
+def main():
+    seed(N, photos_per_item=0)
+    conn = db.connect_raw()
+    try:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        api.load_item_index(conn)
+        build = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"index build: {len(api.item_index)} items in {build:.2f}s, peak memory {peak / 1e6:.1f} MB\n")
+
+        rows = []
+        for q in QUERIES:
+            like_s, like_n = timed(lambda: like_search(conn, q))
+            idx_s, idx_n = timed(lambda: index_search(conn, q), repeat=5)
+            rows.append((q, like_n, f"{like_s * 1000:.1f}", idx_n, f"{idx_s * 1000:.2f}",
+                         f"{like_s / idx_s:.0f}x" if idx_s else "-"))
+        print_table(["query", "like hits", "like ms", "index hits", "index ms", "speedup"], rows)
+
+        print()
+        rows = []
+        for q in ["l", "la", "lap", "SN000", "IT-LAP-00012", "dell"]:
+            secs, found = timed(lambda: api.item_index.search(q, fields=api.TYPEAHEAD_FIELDS, limit=20), repeat=21)
+            # None: prefix too broad for the index, the endpoint answers it with SQL
+            rows.append((q, f"{secs * 1e6:.0f}" if found is not None else "sql fallback"))
+        print_table(["typeahead query", "median us"], rows)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
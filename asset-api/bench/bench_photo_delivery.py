@@ -0,0 +1,69 @@
+"""
+Photo delivery: the old open StaticFiles mount vs the authenticated
+/uploads route (signed URL check, strong ETag, Range), in-process over ASGI
+with no network, so only the application's own overhead differs.
+
+Writes BENCH_PHOTOS (default 200) files of ~BENCH_PHOTO_KB (default 120) KB
+into a temp storage root and fetches each BENCH_ROUNDS (default 5) times:
+  - static     StaticFiles(directory=root), no auth
+  - signed     api /uploads/<key>?exp=&sig=
+  - signed-304 same URL with If-None-Match (browser revalidation)
+  - accel      PHOTO_ACCEL_REDIRECT set: auth + headers only, the web
+               server would send the bytes
+No database.
+"""
+import asyncio, io, os, shutil, tempfile, time
+
+import _common  # noqa: F401  (puts asset-api on sys.path)
+from _common import print_table
+
+N = int(os.getenv("BENCH_PHOTOS", "200"))
+KB = int(os.getenv("BENCH_PHOTO_KB", "120"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "5"))
+
+async def run(app, urls, headers=None):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        total = 0
+        for _ in range(ROUNDS):
+            for url in urls:
+                r = await client.get(url, headers=(headers or {}).get(url))
+                assert r.status_code == (304 if headers else 200), (url, r.status_code)
+                total += len(r.content)
+        return len(urls) * ROUNDS / (time.perf_counter() - t0), total
+
+def main():
+    root = tempfile.mkdtemp(prefix="assetvault_delivery_")
+    os.environ["UPLOAD_DIR"] = root
+    os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+    os.environ.setdefault("ENTRIES_ARCHIVE_INTERVAL", "0")
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    import api, delivery, storage
+    try:
+        keys = [api.photo_store.put(io.BytesIO(b"\xff\xd8\xff" + os.urandom(KB * 1024)), ".jpg").key
+                for _ in range(N)]
+        static = FastAPI()
+        static.mount("/uploads", StaticFiles(directory=root), name="uploads")
+        plain = [f"/uploads/{k}" for k in keys]
+        signed = [delivery.sign_url(u) for u in plain]
+        etags = {u: {"If-None-Match": f'"{storage.key_hash(k)}"'} for u, k in zip(signed, keys)}
+
+        rows = []
+        for name, app, urls, headers in (("static", static, plain, None),
+                                         ("signed", api.app, signed, None),
+                                         ("signed-304", api.app, signed, etags)):
+            per_s, total = asyncio.run(run(app, urls, headers))
+            rows.append((name, f"{per_s:.0f}", f"{total / (1024 * 1024):.1f}"))
+        delivery.PHOTO_ACCEL_REDIRECT = "/_uploads/"
+        per_s, total = asyncio.run(run(api.app, signed))
+        rows.append(("accel", f"{per_s:.0f}", f"{total / (1024 * 1024):.1f}"))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(f"{N} photos of {KB} KB, {ROUNDS} rounds, in-process ASGI\n")
+    print_table(["path", "requests/s", "MB from app"], rows)
+
+if __name__ == "__main__":
+    main()
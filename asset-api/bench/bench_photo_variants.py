@@ -0,0 +1,64 @@
+"""
+Bytes served per Directory page: original uploads vs resized variants.
+
+Generates BENCH_PHOTOS synthetic phone-sized photos (default 50, one page
+of the Directory grid at 4032x3024, JPEG q90 with EXIF), runs
+images.make_variants() on each and reports
+  - bytes for one page when every card loads the original / card / thumb,
+  - variant generation time per photo (single process; the API spreads
+    this over IMAGE_WORKERS processes).
+Needs Pillow (pip install pillow); no database.
+"""
+import os, shutil, tempfile, time
+
+import _common  # noqa: F401  (puts asset-api on sys.path)
+from _common import print_table
+
+import images
+
+N = int(os.getenv("BENCH_PHOTOS", "50"))
+SIZE = (4032, 3024)
+
+def synthetic_photo(path: str, k: int):
+    from PIL import Image, ImageDraw
+    im = Image.effect_noise(SIZE, 40 + k % 30).convert("RGB")
+    draw = ImageDraw.Draw(im)
+    for i in range(0, SIZE[0], 200):
+        draw.rectangle([i, (i * 7 + k * 13) % SIZE[1], i + 150, SIZE[1]], fill=((i + k * 40) % 255, 90, 160))
+    exif = Image.Exif()
+    exif[0x0112] = 6          # orientation: rotate 90
+    exif[0x010F] = "BenchCam"  # make
+    im.save(path, format="JPEG", quality=90, exif=exif.tobytes())
+
+def mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.2f}"
+
+def main():
+    if not images.enabled():
+        raise SystemExit("Pillow is not installed (pip install pillow)")
+    root = tempfile.mkdtemp(prefix="assetvault_variants_")
+    try:
+        rels = []
+        for k in range(N):
+            rel = f"{k:04d}.jpg"
+            synthetic_photo(os.path.join(root, rel), k)
+            rels.append(rel)
+
+        t0 = time.perf_counter()
+        for rel in rels:
+            images.make_variants(root, rel)
+        per_photo = (time.perf_counter() - t0) / N
+
+        sizes = {"original": sum(os.path.getsize(os.path.join(root, r)) for r in rels)}
+        for v in images.VARIANTS:
+            sizes[v] = sum(os.path.getsize(images.find_variant(root, r, v)) for r in rels)
+        rows = [(name, mb(total), f"{total / N / 1024:.0f}", f"{sizes['original'] / total:.0f}x")
+                for name, total in sizes.items()]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(f"{N} photos of {SIZE[0]}x{SIZE[1]}, variants as {images.output_format()}, "
+          f"{per_photo * 1000:.0f} ms per photo for all variants\n")
+    print_table(["served", "MB per page", "KB per photo", "smaller"], rows)
+
+if __name__ == "__main__":
+    main()
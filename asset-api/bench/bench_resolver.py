@@ -0,0 +1,75 @@
+"""
+Item identifier lookups: the old `item_id = %s OR serial_no = %s` query vs
+indexed single-column queries vs the in-process resolver.
+
+Seeds BENCH_RESOLVER_SIZE items (default 100k) and resolves BENCH_LOOKUPS
+random keys (half item_ids, half serial numbers, a few misses):
+  - or-query   the old create_assignment lookup, schema as in assetvault.sql
+               (no index on item_id)
+  - indexed    item_id, then serial_no, after the migrations (unique indexes)
+  - resolver   api.resolve_item(), answered from memory
+Reports lookups per second and the resolver's load time.
+"""
+import os, random, time
+
+from _common import seed, db, print_table
+
+import api
+import migrations
+
+N = int(os.getenv("BENCH_RESOLVER_SIZE", "100000"))
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "2000"))
+
+def keys(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT item_id, serial_no FROM items")
+    rows = cur.fetchall()
+    cur.close()
+    rnd = random.Random(7)
+    out = []
+    for k in range(LOOKUPS):
+        item_id, serial = rows[rnd.randrange(len(rows))]
+        out.append("NOPE-%d" % k if k % 50 == 0 else item_id if k % 2 else serial)
+    return out
+
+def or_query(conn, key):
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT id, item_id, serial_no, name FROM items WHERE item_id = %s OR serial_no = %s LIMIT 1",
+                (key, key))
+    row = cur.fetchone()
+    cur.close()
+    return row
+
+def indexed(conn, key):
+    return api._resolve_item_sql(conn, "item_id", key) or api._resolve_item_sql(conn, "serial_no", key)
+
+def rate(fn, conn, ks):
+    t0 = time.perf_counter()
+    found = sum(1 for k in ks if fn(conn, k))
+    return LOOKUPS / (time.perf_counter() - t0), found
+
+def main():
+    seed(N, photos_per_item=0)
+    conn = db.connect_raw()
+    try:
+        ks = keys(conn)
+        results = []
+        per_s, found = rate(or_query, conn, ks)
+        results.append(("or-query", f"{per_s:.0f}", found))
+
+        migrations.migrate(conn, log=lambda *a: None)
+        per_s, found = rate(indexed, conn, ks)
+        results.append(("indexed", f"{per_s:.0f}", found))
+
+        t0 = time.perf_counter()
+        api.load_item_index(conn)
+        load = time.perf_counter() - t0
+        per_s, found = rate(lambda c, k: api.resolve_item(c, k), conn, ks)
+        results.append(("resolver", f"{per_s:.0f}", found))
+    finally:
+        conn.close()
+    print(f"{N} items, {LOOKUPS} lookups; resolver + search index load {load:.2f}s\n")
+    print_table(["lookup", "per second", "found"], results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+GET /services/overview: live items x service_records GROUP BY vs the
+item_service_state table.
+
+Seeds BENCH_SIZES items with BENCH_SERVICES_PER_ITEM service records for
+two thirds of them (the rest are "never serviced"), spread over the last
+two years. Reports the full legacy list and two filtered pages
+("due in the next 30 days", "overdue in one department").
+"""
+import os, random
+
+from _common import SIZES, seed, db, timed, print_table, DEPARTMENTS
+
+import api
+import migrations
+
+SERVICES_PER_ITEM = int(os.getenv("BENCH_SERVICES_PER_ITEM", "3"))
+
+def seed_services():
+    rnd = random.Random(7)
+    conn = db.connect_raw()
+    cur = conn.cursor()
+    cur.execute("SELECT item_id FROM items")
+    ids = [r[0] for r in cur.fetchall()]
+    batch = []
+    for k, item_id in enumerate(ids):
+        if k % 3 == 0:
+            continue
+        for _ in range(SERVICES_PER_ITEM):
+            batch.append((item_id, rnd.randrange(730)))
+            if len(batch) >= 5000:
+                _insert(cur, batch); batch = []
+    if batch:
+        _insert(cur, batch)
+    conn.commit()
+    cur.close(); conn.close()
+
+def _insert(cur, rows):
+    cur.executemany("""
+        INSERT INTO service_records (item_id, service_date)
+        VALUES (%s, NOW() - INTERVAL %s DAY)
+    """, rows)
+
+def overview_live(conn):
+    # the pre-materialization query (the Python status loop is the same)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT i.item_id, i.name, i.serial_no, i.department, MAX(s.service_date)
+            FROM items i
+            LEFT JOIN service_records s ON s.item_id = i.item_id
+            GROUP BY i.item_id, i.name, i.serial_no, i.department
+            ORDER BY i.item_id
+        """)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+def page(conn, **filters):
+    where, args = api.service_overview_filters(**filters)
+    return api.list_service_overview(conn, where, args,
+                                     order="s.next_due_date ASC, s.item_id ASC", limit=50)
+
+def main():
+    results = []
+    for n in SIZES:
+        seed(n, photos_per_item=0)
+        seed_services()
+        conn = db.connect_raw()
+        try:
+            migrations.migrate(conn, log=lambda *a: None)
+            build_secs, _ = timed(lambda: api.rebuild_service_state(conn), repeat=1)
+            live_secs, live = timed(lambda: overview_live(conn))
+            full_secs, full = timed(lambda: api.list_service_overview(conn))
+            assert len(full) == len(live) == n
+            due_secs, _ = timed(lambda: page(conn, due_within=30))
+            dept_secs, _ = timed(lambda: page(conn, status="due", department=DEPARTMENTS[0]))
+            results.append((n, f"{live_secs * 1000:.1f}", f"{full_secs * 1000:.1f}",
+                            f"{due_secs * 1000:.2f}", f"{dept_secs * 1000:.2f}",
+                            f"{build_secs * 1000:.0f}"))
+        finally:
+            conn.close()
+    print_table(["items", "live ms", "state full ms", "due<=30d page ms",
+                 "overdue/dept page ms", "backfill ms"], results)
+
+if __name__ == "__main__":
+    main()
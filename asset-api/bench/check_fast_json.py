@@ -0,0 +1,162 @@
+"""
+Schema equivalence of the JSON fast path (fastjson.py).
+
+For GET /items, /people, /entries and /people/{id}/history, encodes the
+same synthetic rows twice:
+  - legacy  rows -> pydantic models built field by field with strftime (the
+            row_to_* code before the fast path) -> FastAPI's own
+            serialize_response() against the route's response_model ->
+            JSONResponse body
+  - fast    RowEncoder dicts -> fastjson.dumps()
+and fails unless the bytes are identical, with orjson and with the json
+fallback. Rows include NULLs, non-ASCII, emoji, control characters, quotes,
+U+2028, microsecond datetimes and photo URLs (signed, so both paths must
+agree on the URL window too). No database.
+
+    cd asset-api
+    python bench/check_fast_json.py
+"""
+import asyncio, os, random, sys
+from datetime import date, datetime, timedelta
+
+import _common  # noqa: F401  (puts asset-api on sys.path)
+
+os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+os.environ.setdefault("ENTRIES_ARCHIVE_INTERVAL", "0")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+
+import api  # noqa: E402
+import fastjson  # noqa: E402
+
+N = int(os.getenv("CHECK_ROWS", "2000"))
+AWKWARD = [None, "", "plain", "Ünïcødé ✓", "emoji 🚀📦", 'quote " and \\ backslash',
+           "tab\tnew\nline\rcr", "ctl \x00\x01\x1f\x7f", "sep \u2028 \u2029", "</script>",
+           "  padded  ", "日本語のテキスト"]
+
+rnd = random.Random(24)
+
+def text(required=False):
+    v = rnd.choice(AWKWARD)
+    return (v or "x") if required else v
+
+def when(nullable=True):
+    if nullable and rnd.random() < 0.2:
+        return None
+    return datetime(2020, 1, 1) + timedelta(seconds=rnd.randrange(10 ** 8), microseconds=rnd.randrange(10 ** 6))
+
+def item_rows():
+    rows = []
+    for i in range(N):
+        photo = rnd.choice([None, f"/uploads/ab/cd/{i:064x}.jpg", "https://elsewhere.example/p.png"])
+        rows.append((f"IT-{i}", text(True), rnd.randrange(-5, 10 ** 6), text(), text(), text(), text(),
+                     text(), text(), text(), photo, text(), when(), rnd.choice([None, "Laptop", "UPS"])))
+    return rows
+
+def photos_by_item(rows):
+    out = {}
+    for r in rows:
+        for j in range(rnd.randrange(3)):
+            out.setdefault(r[0], []).append((rnd.randrange(1, 10 ** 6), f"/uploads/{j:02x}/{r[0]}.webp"))
+    return out
+
+def person_rows():
+    return [(i, text(), text(True), rnd.choice([None, 1, 7]), text(), text(),
+             rnd.choice([None, "active", "inactive"]), text()) for i in range(1, N + 1)]
+
+def assignment_rows():
+    return [(i, rnd.choice([None, f"IT-{i}"]), text(), rnd.randrange(1, 100), when(False),
+             rnd.choice([None, date(2025, 1, 1) + timedelta(days=i % 400)]), when(), text())
+            for i in range(1, N + 1)]
+
+def entry_rows():
+    return [(i, when(False), rnd.choice(["assigned", "returned", "service"]), f"IT-{i}",
+             text(), text(), text(), text()) for i in range(1, N + 1)]
+
+# ---- the per-row model builders the endpoints used before fastjson ----
+def _dt(v, fmt="%Y-%m-%d %H:%M:%S"):
+    return v.strftime(fmt) if v else None
+
+def legacy_photo(photo_id, url):
+    return api.PhotoOut(id=int(photo_id), photo_url=api.photo_link(url),
+                        thumb_url=api.photo_variant_url(url, "thumb"),
+                        card_url=api.photo_variant_url(url, "card"),
+                        full_url=api.photo_variant_url(url, "full"))
+
+def legacy_item(r):
+    return api.ItemOut(item_id=r[0], name=r[1], quantity=int(r[2]), serial_no=r[3], model_no=r[4],
+                       department=r[5], owner=r[6], transfer_from=r[7], transfer_to=r[8], notes=r[9],
+                       photo_url=api.photo_link(r[10]),
+                       photo_thumb_url=api.photo_variant_url(r[10], "thumb"),
+                       photo_card_url=api.photo_variant_url(r[10], "card"),
+                       created_by=r[11], created_at=_dt(r[12]), category=r[13])
+
+def legacy_person(r):
+    return api.PersonOut(id=int(r[0]), emp_code=r[1], full_name=r[2], department_id=r[3],
+                         email=r[4], phone=r[5], status=r[6], department_name=r[7])
+
+def legacy_assignment(r):
+    return api.AssignmentOut(id=int(r[0]), item_id=(r[1] or ""), item_name=r[2], person_id=int(r[3]),
+                             assigned_at=_dt(r[4]), due_back_date=_dt(r[5], "%Y-%m-%d"),
+                             returned_at=_dt(r[6]), notes=r[7])
+
+def legacy_entry(r):
+    return api.EntryOut(id=int(r[0]), event_time=_dt(r[1]) or "", event=r[2], item_id=r[3],
+                        from_holder=r[4], to_holder=r[5], by_user=r[6], notes=r[7])
+
+def route(path):
+    for r in api.app.routes:
+        if isinstance(r, APIRoute) and r.path == path and "GET" in r.methods:
+            return r
+    raise LookupError(path)
+
+def legacy_body(path, objs):
+    r = route(path)
+    field = getattr(r, "secure_cloned_response_field", None) or r.response_field
+    content = asyncio.run(serialize_response(field=field, response_content=objs, is_coroutine=True))
+    return JSONResponse(content).body
+
+def cases():
+    items = item_rows()
+    photos = photos_by_item(items)
+    models = [legacy_item(r) for r in items]
+    for m in models:
+        m.photos = [legacy_photo(*p) for p in photos.get(m.item_id, [])]
+    dicts = api.ITEM_ROW.rows(items)
+    for d in dicts:
+        d["photos"] = [api.PHOTO_ROW.row(p) for p in photos.get(d["item_id"], [])]
+    yield "/items", models, dicts
+
+    people = person_rows()
+    yield "/people", [legacy_person(r) for r in people], api.PERSON_ROW.rows(people)
+    hist = assignment_rows()
+    yield ("/people/{person_id}/history", [legacy_assignment(r) for r in hist],
+           api.ASSIGNMENT_ROW.rows(hist))
+    entries = entry_rows()
+    yield "/entries", [legacy_entry(r) for r in entries], api.ENTRY_ROW.rows(entries)
+
+def main():
+    failed = 0
+    encoders = [("orjson", fastjson.orjson), ("json", None)] if fastjson.orjson else [("json", None)]
+    for path, models, dicts in cases():
+        want = legacy_body(path, models)
+        for name, impl in encoders:
+            saved, fastjson.orjson = fastjson.orjson, impl
+            try:
+                got = fastjson.dumps(dicts)
+            finally:
+                fastjson.orjson = saved
+            ok = got == want
+            failed += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {path:<30} {name:<7} {len(want):>9} bytes")
+            if not ok:
+                at = next((i for i, (a, b) in enumerate(zip(got, want)) if a != b), min(len(got), len(want)))
+                print("     legacy:", want[max(0, at - 60):at + 60])
+                print("     fast:  ", got[max(0, at - 60):at + 60])
+    if not fastjson.orjson:
+        print("(orjson not installed: only the json fallback was checked)")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
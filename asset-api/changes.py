@@ -0,0 +1,171 @@
+# changes.py
+"""
+Change log shared by the in-memory indexes.
+
+Writers call note_change(conn, table, keys) inside their transaction; each
+row gets a global, monotonically increasing version. A ChangeFeed keeps the
+last version one in-process consumer has applied and, on sync(), replays the
+newer rows for the tables it follows, or asks for a full reload when it has
+fallen too far behind (or the log was pruned past it). Every uvicorn worker
+runs its own feeds, so stale workers catch up on their own.
+"""
+import os, time, threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CHANGES_SYNC_INTERVAL = float(os.getenv("CHANGES_SYNC_INTERVAL", "1"))
+CHANGES_KEEP = int(os.getenv("CHANGES_KEEP", "50000"))
+CHANGES_REPLAY_MAX = 5000
+# versions are allocated at INSERT time but become visible at COMMIT, so a
+# lower version can show up after a higher one. Holes are re-checked until
+# they fill in or are older than this (rolled-back inserts leave holes forever).
+CHANGES_GAP_TIMEOUT = float(os.getenv("CHANGES_GAP_TIMEOUT", "30"))
+
+def note_change(conn, table: str, keys: Iterable) -> None:
+    """
+    Record changed rows of `table`. Call inside the write's transaction.
+    """
+    rows = [(table, str(k)) for k in dict.fromkeys(keys) if k is not None and k != ""]
+    if not rows:
+        return
+    cur = conn.cursor()
+    try:
+        cur.executemany("INSERT INTO change_log (table_name, row_key) VALUES (%s, %s)", rows)
+        last = int(cur.lastrowid or 0)
+        # prune roughly every 1000 versions
+        if last and last // 1000 != (last - len(rows)) // 1000:
+            cur.execute("DELETE FROM change_log WHERE version < %s", (last - CHANGES_KEEP,))
+    finally:
+        cur.close()
+
+def current_version(conn) -> int:
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM change_log")
+        return int(cur.fetchone()[0] or 0)
+    finally:
+        cur.close()
+
+# ---- per-table version stamps ----
+# One counter per logical table in table_versions (migration 11), bumped by
+# every write and read by conditional GETs (see conditional_get in api.py).
+# The bump is part of the write's transaction, so a reader never sees a new
+# version with old rows. It holds the counter's row lock until commit: call
+# it once per transaction, right before the commit.
+def bump_versions(conn, tables: Iterable[str]) -> None:
+    names = sorted(set(tables))   # fixed lock order across writers
+    if not names:
+        return
+    cur = conn.cursor()
+    try:
+        # start from the clock so a recreated table never reuses old stamps
+        cur.execute(
+            "INSERT INTO table_versions (table_name, version) VALUES "
+            + ",".join(["(%s, UNIX_TIMESTAMP())"] * len(names))
+            + " ON DUPLICATE KEY UPDATE version = version + 1",
+            tuple(names),
+        )
+    finally:
+        cur.close()
+
+def table_versions(conn, tables: Sequence[str]) -> Dict[str, int]:
+    """
+    Current stamp per table (0 for a table never written since migration 11).
+    """
+    out = {t: 0 for t in tables}
+    if not out:
+        return out
+    cur = conn.cursor()
+    try:
+        marks = ",".join(["%s"] * len(out))
+        cur.execute(f"SELECT table_name, version FROM table_versions WHERE table_name IN ({marks})", tuple(out))
+        for name, version in cur.fetchall():
+            out[name] = int(version)
+    finally:
+        cur.close()
+    return out
+
+class ChangeFeed:
+    """
+    apply(conn, [(table, key), ...])  incremental update for replayed rows
+    reload(conn)                      full rebuild; must call mark_loaded()
+                                      with a version read *before* loading
+    """
+    def __init__(self, tables: List[str],
+                 apply: Callable[[object, List[Tuple[str, str]]], None],
+                 reload: Callable[[object], None],
+                 interval: float = CHANGES_SYNC_INTERVAL):
+        self.tables = set(tables)
+        self._apply = apply
+        self._reload = reload
+        self.interval = interval
+        self.version = 0
+        self.loaded = False
+        self._checked = 0.0
+        self._gaps = {}   # version -> first seen missing (monotonic)
+        self._lock = threading.Lock()
+
+    def mark_loaded(self, version: int) -> None:
+        self.version = version
+        self.loaded = True
+        self._gaps = {}
+        self._checked = time.monotonic()
+
+    def sync(self, conn, force: bool = False) -> None:
+        """
+        Throttled to one check per `interval` unless force=True (used right
+        after this worker's own writes). Never blocks behind another sync
+        unless forced.
+        """
+        if not self.loaded:
+            return
+        now = time.monotonic()
+        if not force and now - self._checked < self.interval:
+            return
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._checked = now
+            self._gaps = {v: t for v, t in self._gaps.items() if now - t < CHANGES_GAP_TIMEOUT}
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT MIN(version), MAX(version) FROM change_log")
+                lo, hi = cur.fetchone()
+                hi = int(hi or 0)
+                rows = []
+                if self._gaps:
+                    marks = ",".join(["%s"] * len(self._gaps))
+                    cur.execute(
+                        f"SELECT version, table_name, row_key FROM change_log WHERE version IN ({marks})",
+                        tuple(self._gaps),
+                    )
+                    rows.extend(cur.fetchall())
+                if hi > self.version:
+                    if int(lo) > self.version + 1 or hi - self.version > CHANGES_REPLAY_MAX:
+                        rows = None
+                    else:
+                        cur.execute(
+                            "SELECT version, table_name, row_key FROM change_log WHERE version > %s ORDER BY version",
+                            (self.version,),
+                        )
+                        fresh = cur.fetchall()
+                        seen = {int(r[0]) for r in fresh}
+                        top = max(seen) if seen else self.version
+                        for v in range(self.version + 1, top):
+                            if v not in seen:
+                                self._gaps.setdefault(v, now)
+                        self.version = top
+                        rows.extend(fresh)
+            finally:
+                cur.close()
+
+            if rows is None:
+                # pruned past us / too far behind: start over
+                self._reload(conn)
+                return
+            for r in rows:
+                self._gaps.pop(int(r[0]), None)
+            changed = [(r[1], r[2]) for r in rows if r[1] in self.tables]
+            if changed:
+                self._apply(conn, changed)
+        finally:
+            self._lock.release()
@@ -1,13 +1,280 @@
-import os, mysql.connector
+import os, time, threading, mysql.connector
 from dotenv import load_dotenv
 load_dotenv()
 
+# --------------------------------------------------------------------------
+# Connection settings
+# --------------------------------------------------------------------------
+DB_CONFIG = dict(
+    host=os.getenv("DB_HOST","127.0.0.1"),
+    port=int(os.getenv("DB_PORT","3306")),
+    user=os.getenv("DB_USER","root"),
+    password=os.getenv("DB_PASS","pass1234"),
+    database=os.getenv("DB_NAME","assetvault"),
+    autocommit=False,
+)
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # seconds to wait for a free connection
+POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))      # max connection age in seconds (<=0 disables)
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") not in ("0", "false", "False", "")
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "5"))   # only ping connections idle longer than this
+POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(POOL_SIZE)))
+
+def connect_raw():
+    """
+    Open a brand-new, unpooled connection (migrations, CLI tools, benchmarks).
+    """
+    return mysql.connector.connect(**DB_CONFIG)
+
+class PoolTimeout(Exception):
+    pass
+
+# --------------------------------------------------------------------------
+# Pooled connection
+# --------------------------------------------------------------------------
+class PooledConnection:
+    """
+    Thin proxy around a mysql.connector connection.
+    Everything is delegated to the real connection except close(),
+    which rolls back any open transaction and hands the connection
+    back to the pool instead of tearing down the socket.
+    """
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._last_used = time.monotonic()
+        self._checked_out = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        if self._checked_out:
+            self._checked_out = False
+            self._pool._release(self)
+
+class ConnectionPool:
+    """
+    Fixed-size pool with bounded overflow.
+
+    - size:         connections kept open while idle
+    - max_overflow: extra connections opened under load, closed on return
+    - timeout:      seconds a caller waits for a connection before PoolTimeout
+    - recycle:      connections older than this are replaced on checkout
+    - pre_ping:     ping connections idle > ping_after before handing them out
+    """
+    def __init__(self, factory=connect_raw, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                 timeout=POOL_TIMEOUT, recycle=POOL_RECYCLE, pre_ping=POOL_PRE_PING,
+                 ping_after=POOL_PING_AFTER):
+        self._factory = factory
+        self.size = max(1, size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.ping_after = ping_after
+
+        self._idle = []        # LIFO stack of PooledConnection
+        self._open = 0         # idle + checked out
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "waits": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+            "checkout_time_total_ms": 0.0,
+            "checkout_time_max_ms": 0.0,
+        }
+
+    # ---- internals ----
+    def _new(self):
+        raw = self._factory()
+        with self._cond:
+            self._stats["created"] += 1
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _close_raw(self, pc):
+        try:
+            pc._raw.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, pc) -> bool:
+        now = time.monotonic()
+        if self.recycle and self.recycle > 0 and now - pc._created_at > self.recycle:
+            with self._cond:
+                self._stats["recycled"] += 1
+            return False
+        if self.pre_ping and now - pc._last_used > self.ping_after:
+            try:
+                pc._raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats["ping_failures"] += 1
+                return False
+        return True
+
+    def _drop(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    # ---- public API ----
+    def connect(self) -> PooledConnection:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            pc = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._idle:
+                        pc = self._idle.pop()
+                        break
+                    if self._open < self.size + self.max_overflow:
+                        self._open += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No database connection available within {self.timeout:.0f}s "
+                            f"(size={self.size}, overflow={self.max_overflow})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    pc = self._new()
+                except Exception:
+                    self._drop()
+                    raise
+            elif not self._is_usable(pc):
+                self._close_raw(pc)
+                self._drop()
+                continue
+            break
+
+        pc._checked_out = True
+        pc._last_used = time.monotonic()
+        wait_ms = (pc._last_used - started) * 1000.0
+        with self._cond:
+            s = self._stats
+            s["checkouts"] += 1
+            if waited:
+                s["waits"] += 1
+            s["wait_time_total_ms"] += wait_ms
+            s["wait_time_max_ms"] = max(s["wait_time_max_ms"], wait_ms)
+        return pc
+
+    def _release(self, pc):
+        now = time.monotonic()
+        held_ms = (now - pc._last_used) * 1000.0
+        healthy = True
+        try:
+            # never leak an uncommitted transaction into the next request
+            pc._raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            s = self._stats
+            s["checkout_time_total_ms"] += held_ms
+            s["checkout_time_max_ms"] = max(s["checkout_time_max_ms"], held_ms)
+            pc._last_used = now
+            if healthy and len(self._idle) < self.size:
+                self._idle.append(pc)
+                self._cond.notify()
+                return
+            self._open -= 1
+            if not healthy:
+                s["discarded"] += 1
+            self._cond.notify()
+        self._close_raw(pc)
+
+    def warm_up(self, n=None) -> int:
+        """
+        Open up to n connections (default DB_POOL_WARMUP) so the first
+        requests after startup don't pay the TCP/auth handshake.
+        """
+        n = min(self.size, POOL_WARMUP if n is None else n)
+        opened = []
+        try:
+            while len(opened) < n:
+                with self._cond:
+                    if self._open >= self.size:
+                        break
+                    self._open += 1
+                try:
+                    opened.append(self._new())
+                except Exception:
+                    self._drop()
+                    raise
+        finally:
+            with self._cond:
+                self._idle.extend(opened)
+                self._cond.notify_all()
+        return len(opened)
+
+    def dispose(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for pc in idle:
+            self._close_raw(pc)
+
+    def stats(self) -> dict:
+        with self._cond:
+            s = dict(self._stats)
+            idle = len(self._idle)
+            opened = self._open
+        checkouts = s["checkouts"] or 1
+        s.update({
+            "size": self.size,
+            "max_overflow": self.max_overflow,
+            "open": opened,
+            "idle": idle,
+            "in_use": opened - idle,
+            "overflow": max(0, opened - self.size),
+            "wait_time_avg_ms": round(s["wait_time_total_ms"] / checkouts, 3),
+            "checkout_time_avg_ms": round(s["checkout_time_total_ms"] / checkouts, 3),
+        })
+        for k in ("wait_time_total_ms", "wait_time_max_ms", "checkout_time_total_ms", "checkout_time_max_ms"):
+            s[k] = round(s[k], 3)
+        return s
+
+pool = ConnectionPool()
+
 def get_conn():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST","127.0.0.1"),
-        port=int(os.getenv("DB_PORT","3306")),
-        user=os.getenv("DB_USER","root"),
-        password=os.getenv("DB_PASS","pass1234"),
-        database=os.getenv("DB_NAME","assetvault"),
-        autocommit=False,
-    )
+    """
+    Check a connection out of the shared pool.
+    conn.close() returns it to the pool.
+    """
+    return pool.connect()
+
+def get_db():
+    """
+    FastAPI dependency: one pooled connection per request,
+    returned to the pool once the response has been produced.
+    """
+    conn = pool.connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
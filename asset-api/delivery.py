@@ -0,0 +1,162 @@
+# delivery.py
+"""
+Authenticated photo delivery.
+
+Photos are no longer a public static directory. A request must carry either
+the usual bearer token or a signed URL. Signed URLs are what API payloads
+hand out, because an <img> tag cannot send headers:
+
+    /uploads/ab/cd/<sha>.jpg?exp=1760745600&sig=<hmac>
+
+exp is rounded up to PHOTO_URL_TTL (default one day), so a URL is valid for
+one to two TTLs and stays the same within a window, and browser caches keep
+hitting. The signature is an HMAC-SHA256 of path and exp with
+PHOTO_URL_SECRET (default: the JWT secret).
+
+Files are content-addressed (see storage.py), so responses are
+`Cache-Control: private, max-age=31536000, immutable` with a strong ETag.
+If-None-Match answers 304, and a single `Range: bytes=` is answered 206.
+With PHOTO_ACCEL_REDIRECT set to an nginx internal location (e.g.
+/_uploads/), the app only authorizes the request and sends
+X-Accel-Redirect (or PHOTO_ACCEL_HEADER, e.g. X-Sendfile), and the web
+server streams the file with sendfile. Otherwise the file is sent by
+FileResponse, which uses the server's zero-copy pathsend extension when
+available.
+"""
+import base64, hmac, mimetypes, os, time
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+from security import JWT_SECRET
+
+PHOTO_URL_SECRET = (os.getenv("PHOTO_URL_SECRET") or JWT_SECRET).encode()
+PHOTO_URL_TTL = int(os.getenv("PHOTO_URL_TTL", str(24 * 3600)))
+PHOTO_ACCEL_REDIRECT = os.getenv("PHOTO_ACCEL_REDIRECT", "")    # e.g. "/_uploads/"
+PHOTO_ACCEL_HEADER = os.getenv("PHOTO_ACCEL_HEADER", "X-Accel-Redirect")
+CACHE_IMMUTABLE = "private, max-age=31536000, immutable"
+CACHE_REVALIDATE = "private, no-cache"
+RANGE_CHUNK = 64 * 1024
+# signed URLs are the same for a whole window, and list endpoints sign
+# several per row on every request, so they are kept (cleared when full)
+SIGNED_URL_CACHE = int(os.getenv("SIGNED_URL_CACHE", "100000"))
+
+_signed: Dict[Tuple[str, int], str] = {}
+
+# ---- signed URLs ----
+def _signature(path: str, exp: int) -> str:
+    # one-shot hmac.digest: several URLs per row on the list endpoints
+    mac = hmac.digest(PHOTO_URL_SECRET, f"{path}\n{exp}".encode(), "sha256")
+    return base64.urlsafe_b64encode(mac[:18]).decode()
+
+def sign_url(path: Optional[str], now: Optional[float] = None) -> Optional[str]:
+    if not path:
+        return path
+    now = time.time() if now is None else now
+    exp = (int(now) // PHOTO_URL_TTL + 2) * PHOTO_URL_TTL
+    url = _signed.get((path, exp))
+    if url is None:
+        url = f"{path}?exp={exp}&sig={_signature(path, exp)}"
+        if len(_signed) >= SIGNED_URL_CACHE:
+            _signed.clear()
+        _signed[(path, exp)] = url
+    return url
+
+def url_window(now: Optional[float] = None) -> int:
+    """
+    Changes whenever sign_url() starts handing out new URLs.
+    """
+    return int(time.time() if now is None else now) // PHOTO_URL_TTL
+
+def verify_signed(path: str, exp: Optional[str], sig: Optional[str]) -> bool:
+    if not exp or not sig or not exp.isdigit() or int(exp) < time.time():
+        return False
+    return hmac.compare_digest(sig, _signature(path, int(exp)))
+
+# ---- conditional / range responses ----
+def strong_etag(st: os.stat_result, content_hash: Optional[str] = None, tag: str = "") -> str:
+    """
+    The content hash when the file is content-addressed (plus a tag for
+    derived files, which are regenerated in place), else size and mtime.
+    """
+    if content_hash and not tag:
+        return f'"{content_hash}"'
+    base = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    return f'"{content_hash}.{tag}.{base}"' if content_hash else f'"{base}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, so W/ prefixes are ignored).
+    """
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any(t.strip() in ("*", bare, "W/" + bare) for t in header.split(","))
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end inclusive) of a single byte range. None means serve the
+    whole file, including for multi-range requests; ValueError means 416.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first == "":
+            n = int(last)
+            if n <= 0:
+                raise ValueError(header)
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None   # malformed: ignored, like most servers
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+class FileRangeResponse(Response):
+    def __init__(self, path: str, start: int, end: int, size: int, headers: dict, media_type: str):
+        super().__init__(status_code=206, headers=headers, media_type=media_type)
+        self.path, self.start, self.end = path, start, end
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(RANGE_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def send_file(request: Request, path: str, rel: str, etag: str, cache_control: str) -> Response:
+    """
+    Serve path (rel to the upload root) with validators and Range support,
+    or hand it to the web server when PHOTO_ACCEL_REDIRECT is set.
+    """
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {"etag": etag, "cache-control": cache_control, "accept-ranges": "bytes"}
+    inm = request.headers.get("if-none-match")
+    if inm and etag_matches(inm, etag):
+        return Response(status_code=304, headers=headers)
+    if PHOTO_ACCEL_REDIRECT:
+        # nginx keeps these headers and does Range / conditionals itself
+        headers[PHOTO_ACCEL_HEADER] = PHOTO_ACCEL_REDIRECT.rstrip("/") + "/" + rel
+        return Response(headers=headers, media_type=media_type)
+    size = os.path.getsize(path)
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == etag:
+        try:
+            rng = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+        if rng is not None:
+            return FileRangeResponse(path, rng[0], rng[1], size, headers, media_type)
+    return FileResponse(path, headers=headers, media_type=media_type)
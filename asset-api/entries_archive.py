@@ -0,0 +1,340 @@
+# entries_archive.py
+"""
+Retention for the entries (audit log) table.
+
+Opt-in: with ENTRIES_RETENTION_MONTHS unset or 0 (the default) nothing is
+ever removed from the table. Set it, and point ENTRIES_ARCHIVE_DIR at
+durable storage, to enable archiving.
+
+Entries older than ENTRIES_RETENTION_MONTHS whole months are moved, one
+calendar month at a time, into gzip-compressed NDJSON files under
+ENTRIES_ARCHIVE_DIR (entries-YYYY-MM.ndjson.gz, newest first like
+GET /entries). The archive is written and fsynced before the rows are
+removed, and the rows are removed in one step, so a crash leaves either
+both copies (the next run rewrites the file) or just the archive. Only rows
+that are in the file are removed (by id), so a row that arrives for an
+old month while it is being archived waits for the next run. Archived
+months stay readable through GET /entries/archive/{month}.
+
+The table can optionally be range-partitioned by month. Removing a month
+is then an instant DROP PARTITION instead of a DELETE:
+
+    cd asset-api
+    python entries_archive.py --partition   # convert (rebuilds the table once)
+    python entries_archive.py --archive     # archive / add partitions now
+    python entries_archive.py --status
+
+The API runs the archive job every ENTRIES_ARCHIVE_INTERVAL seconds; with
+retention 0 it only keeps future partitions in place.
+"""
+import gzip, json, os, re, sys
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+ENTRIES_RETENTION_MONTHS = int(os.getenv("ENTRIES_RETENTION_MONTHS", "0"))   # 0 keeps everything
+ENTRIES_ARCHIVE_DIR = os.getenv("ENTRIES_ARCHIVE_DIR", os.path.join("archive", "entries"))
+ENTRIES_ARCHIVE_INTERVAL = float(os.getenv("ENTRIES_ARCHIVE_INTERVAL", "86400"))
+ENTRIES_PARTITIONS_AHEAD = 3
+ARCHIVE_DELETE_BATCH = 1000
+ARCHIVE_LOCK_NAME = "assetvault_entries_archive"
+
+ENTRY_COLUMNS = ["id", "event_time", "event", "item_id", "from_holder", "to_holder", "by_user", "notes"]
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+# ---- months ----
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+def add_months(d: date, n: int) -> date:
+    m = d.year * 12 + d.month - 1 + n
+    return date(m // 12, m % 12 + 1, 1)
+
+def parse_month(month: str) -> date:
+    if not _MONTH_RE.match(month or ""):
+        raise ValueError("month must be YYYY-MM")
+    return date(int(month[:4]), int(month[5:]), 1)
+
+def partition_name(d: date) -> str:
+    return f"p{d.year:04d}{d.month:02d}"
+
+def archive_path(d: date) -> str:
+    return os.path.join(ENTRIES_ARCHIVE_DIR, f"entries-{d.year:04d}-{d.month:02d}.ndjson.gz")
+
+# ---- partitioning ----
+def partitions(conn) -> List[str]:
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT PARTITION_NAME FROM INFORMATION_SCHEMA.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'entries'
+              AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """)
+        return [r[0] for r in cur.fetchall()]
+    finally:
+        cur.close()
+
+def _partition_defs(first: date, last: date) -> str:
+    defs = []
+    d = first
+    while d <= last:
+        defs.append(f"PARTITION {partition_name(d)} VALUES LESS THAN ('{add_months(d, 1).isoformat()}')")
+        d = add_months(d, 1)
+    defs.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return ",\n".join(defs)
+
+def partition_entries(conn, log: Callable[..., None] = print) -> bool:
+    """
+    Convert entries to monthly RANGE COLUMNS(event_time) partitions.
+    The primary key becomes (id, event_time): MySQL requires the
+    partitioning column in every unique key. Rebuilds the table.
+    """
+    if partitions(conn):
+        return False
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MIN(event_time) FROM entries")
+        oldest = cur.fetchone()[0]
+        first = month_start(oldest.date() if oldest else date.today())
+        last = add_months(month_start(date.today()), ENTRIES_PARTITIONS_AHEAD)
+        cur.execute("ALTER TABLE entries DROP PRIMARY KEY, ADD PRIMARY KEY (id, event_time)")
+        cur.execute(f"ALTER TABLE entries PARTITION BY RANGE COLUMNS(event_time) (\n{_partition_defs(first, last)}\n)")
+    finally:
+        cur.close()
+    log(f"ENTRIES_PARTITIONED: {partition_name(first)}..{partition_name(last)}")
+    return True
+
+def ensure_future_partitions(conn, ahead: int = ENTRIES_PARTITIONS_AHEAD) -> int:
+    """
+    Split pmax so there is a partition for each of the next `ahead` months.
+    """
+    names = partitions(conn)
+    if not names:
+        return 0
+    months = sorted(parse_month(f"{n[1:5]}-{n[5:7]}") for n in names if re.match(r"^p\d{6}$", n))
+    start = add_months(months[-1], 1) if months else month_start(date.today())
+    last = add_months(month_start(date.today()), ahead)
+    if start > last:
+        return 0
+    cur = conn.cursor()
+    try:
+        cur.execute(f"ALTER TABLE entries REORGANIZE PARTITION pmax INTO (\n{_partition_defs(start, last)}\n)")
+    finally:
+        cur.close()
+    added = 0
+    d = start
+    while d <= last:
+        added += 1
+        d = add_months(d, 1)
+    return added
+
+# ---- archiving ----
+def _row_json(row) -> str:
+    out = {}
+    for col, v in zip(ENTRY_COLUMNS, row):
+        if isinstance(v, datetime):
+            v = v.strftime("%Y-%m-%d %H:%M:%S")
+        out[col] = v
+    return json.dumps(out, ensure_ascii=False)
+
+def _sort_key(rec: Dict[str, Any]):
+    return (rec.get("event_time") or "", int(rec.get("id") or 0))
+
+def archive_month(conn, month: date, log: Callable[..., None] = print) -> int:
+    """
+    Move one month of entries into its archive file. Returns the rows
+    removed from the table (some may have been in the file already).
+    """
+    lo, hi = month, add_months(month, 1)
+    path = archive_path(month)
+    tmp = path + ".tmp"
+    os.makedirs(ENTRIES_ARCHIVE_DIR, exist_ok=True)
+
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM entries WHERE event_time >= %s AND event_time < %s", (lo, hi))
+        expected = int(cur.fetchone()[0] or 0)
+    finally:
+        cur.close()
+
+    names = partitions(conn)
+    part = partition_name(month)
+    if expected == 0 and part not in names:
+        return 0
+
+    # rows still in the table for a month that already has a file (late
+    # writes, or a crash before the delete): merge, file rows win on id
+    existing: Dict[int, str] = {}
+    if os.path.exists(path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    existing[int(json.loads(line)["id"])] = line.rstrip("\n")
+
+    # covered: table rows that are in the new file, whether added now or
+    # already there from a run that died before the delete
+    ids: List[int] = []
+    written = 0
+    cur = conn.cursor(buffered=False)
+    try:
+        cur.execute(f"""
+            SELECT {', '.join(ENTRY_COLUMNS)} FROM entries
+            WHERE event_time >= %s AND event_time < %s
+            ORDER BY event_time DESC, id DESC
+        """, (lo, hi))
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as out:
+            if existing:
+                merged = {int(r[0]): _row_json(r) for r in cur}
+                ids = list(merged)
+                written = sum(1 for i in ids if i not in existing)
+                merged.update(existing)
+                recs = sorted((json.loads(v) for v in merged.values()), key=_sort_key, reverse=True)
+                for rec in recs:
+                    out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            else:
+                while True:
+                    rows = cur.fetchmany(1000)
+                    if not rows:
+                        break
+                    out.write("".join(_row_json(r) + "\n" for r in rows))
+                    ids.extend(int(r[0]) for r in rows)
+                written = len(ids)
+    finally:
+        cur.close()
+    covered = len(ids)
+    if covered < expected:
+        os.remove(tmp)
+        raise RuntimeError(f"entries {month:%Y-%m}: archived {covered} of {expected} rows; table left as is")
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    # only the rows that are in the file: one that landed in the month after
+    # the SELECT above stays for the next run
+    cur = conn.cursor()
+    try:
+        dropped = False
+        if part in names:
+            cur.execute("SELECT COUNT(*), MAX(id) FROM entries WHERE event_time >= %s AND event_time < %s", (lo, hi))
+            n, top = cur.fetchone()
+            if int(n or 0) == covered and (top is None or int(top) == max(ids)):
+                cur.execute(f"ALTER TABLE entries DROP PARTITION {part}")
+                dropped = True
+        if not dropped:
+            for start in range(0, covered, ARCHIVE_DELETE_BATCH):
+                chunk = ids[start:start + ARCHIVE_DELETE_BATCH]
+                cur.execute(
+                    f"DELETE FROM entries WHERE event_time >= %s AND event_time < %s "
+                    f"AND id IN ({','.join(['%s'] * len(chunk))})",
+                    (lo, hi, *chunk),
+                )
+            conn.commit()
+    finally:
+        cur.close()
+    log(f"ENTRIES_ARCHIVED: {month:%Y-%m} {covered} rows ({written} new) -> {path}")
+    return covered
+
+def archive_old_entries(conn, retention_months: int = ENTRIES_RETENTION_MONTHS,
+                        log: Callable[..., None] = print) -> Dict[str, int]:
+    """
+    Archive every month older than the retention window and keep future
+    partitions in place. Serialized across workers with a named lock.
+    """
+    out = {"months": 0, "rows": 0, "partitions_added": 0}
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, 0)", (ARCHIVE_LOCK_NAME,))
+        if not cur.fetchone()[0]:
+            return out
+        try:
+            out["partitions_added"] = ensure_future_partitions(conn)
+            if retention_months <= 0:
+                return out
+            cutoff = add_months(month_start(date.today()), -retention_months)
+            cur.execute("SELECT MIN(event_time) FROM entries WHERE event_time < %s", (cutoff,))
+            oldest = cur.fetchone()[0]
+            conn.commit()
+            months = set()
+            if oldest is not None:
+                d = month_start(oldest.date())
+                while d < cutoff:
+                    months.add(d)
+                    d = add_months(d, 1)
+            # empty partitions below the cutoff go too
+            for name in partitions(conn):
+                if re.match(r"^p\d{6}$", name):
+                    d = parse_month(f"{name[1:5]}-{name[5:7]}")
+                    if d < cutoff:
+                        months.add(d)
+            for d in sorted(months):
+                n = archive_month(conn, d, log)
+                out["months"] += 1
+                out["rows"] += n
+            return out
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (ARCHIVE_LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+# ---- reading archives ----
+def list_archives() -> List[Dict[str, Any]]:
+    out = []
+    if not os.path.isdir(ENTRIES_ARCHIVE_DIR):
+        return out
+    for name in sorted(os.listdir(ENTRIES_ARCHIVE_DIR), reverse=True):
+        m = re.match(r"^entries-(\d{4}-\d{2})\.ndjson\.gz$", name)
+        if m:
+            out.append({"month": m.group(1),
+                        "bytes": os.path.getsize(os.path.join(ENTRIES_ARCHIVE_DIR, name))})
+    return out
+
+def read_archive(month: date, match: Callable[[Dict[str, Any]], bool],
+                 after: Optional[Tuple[str, int]], limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Up to `limit` matching records of one archived month in (event_time,
+    id) DESC order, starting after the keyset `after`. Returns (rows, more).
+    The file is scanned sequentially; archives are cold data.
+    """
+    path = archive_path(month)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    rows: List[Dict[str, Any]] = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            if after is not None and _sort_key(rec) >= (after[0], after[1]):
+                continue
+            if not match(rec):
+                continue
+            if len(rows) == limit:
+                return rows, True
+            rows.append(rec)
+    return rows, False
+
+def iter_archive(month: date) -> Iterator[Dict[str, Any]]:
+    with gzip.open(archive_path(month), "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def main(argv: List[str]) -> int:
+    from db import connect_raw
+    conn = connect_raw()
+    try:
+        if "--partition" in argv:
+            partition_entries(conn)
+        if "--archive" in argv:
+            print("archive:", archive_old_entries(conn))
+        names = partitions(conn)
+        print("partitions:", f"{names[0]}..{names[-1]} ({len(names)})" if names else "none")
+        print("retention months:", ENTRIES_RETENTION_MONTHS or "keep all")
+        print("archives:", ", ".join(a["month"] for a in list_archives()) or "none")
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
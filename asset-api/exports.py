@@ -0,0 +1,165 @@
+# exports.py
+"""
+Streaming encoders for the /…/export endpoints.
+
+stream_export(fmt, columns, rows) turns an iterator of row tuples into an
+iterator of byte chunks (CSV, NDJSON or XLSX). Rows are encoded as they
+arrive and flushed every EXPORT_CHUNK_BYTES, so memory does not depend on
+how many rows are exported.
+
+XLSX is written directly (one worksheet, inline strings, zip streamed
+with data descriptors) instead of through a spreadsheet library, which
+would keep the workbook in memory. Excel stops at 1,048,576 rows per sheet.
+"""
+import csv, io, json, os, re, zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Sequence
+from xml.sax.saxutils import escape
+
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+def export_value(v: Any) -> Any:
+    """
+    JSON-friendly cell value (datetimes as 'YYYY-MM-DD HH:MM:SS', like the API).
+    """
+    if isinstance(v, datetime):
+        return v.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return int(v) if v == v.to_integral_value() else float(v)
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", "replace")
+    return v
+
+def stream_export(fmt: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                  sheet: str = "export") -> Iterator[bytes]:
+    if fmt == "csv":
+        return _csv_chunks(columns, rows)
+    if fmt == "ndjson":
+        return _ndjson_chunks(columns, rows)
+    if fmt == "xlsx":
+        return _xlsx_chunks(columns, rows, sheet)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+# ---- CSV / NDJSON ----
+def _csv_chunks(columns, rows) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(["" if v is None else export_value(v) for v in row])
+        if buf.tell() >= EXPORT_CHUNK_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+def _ndjson_chunks(columns, rows) -> Iterator[bytes]:
+    parts: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps({c: export_value(v) for c, v in zip(columns, row)}, ensure_ascii=False)
+        parts.append(line)
+        size += len(line) + 1
+        if size >= EXPORT_CHUNK_BYTES:
+            parts.append("")
+            yield "\n".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        parts.append("")
+        yield "\n".join(parts).encode("utf-8")
+
+# ---- XLSX ----
+_XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# characters XML 1.0 does not allow (tab / newline / CR are fine)
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+def _xlsx_parts(sheet: str):
+    name = escape(_XML_ILLEGAL.sub("", sheet)[:31] or "export", {'"': "&quot;"})
+    return [
+        ("[Content_Types].xml", _XML_HEAD +
+         '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+         '<Default Extension="xml" ContentType="application/xml"/>'
+         '<Override PartName="/xl/workbook.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+         '<Override PartName="/xl/worksheets/sheet1.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+         '</Types>'),
+        ("_rels/.rels", _XML_HEAD +
+         f'<Relationships xmlns="{_NS_PKG_REL}">'
+         f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+         '</Relationships>'),
+        ("xl/workbook.xml", _XML_HEAD +
+         f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}">'
+         f'<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+         '</workbook>'),
+        ("xl/_rels/workbook.xml.rels", _XML_HEAD +
+         f'<Relationships xmlns="{_NS_PKG_REL}">'
+         f'<Relationship Id="rId1" Type="{_NS_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+         '</Relationships>'),
+    ]
+
+def _xlsx_cell(v: Any) -> str:
+    if v is None:
+        return "<c/>"
+    v = export_value(v)
+    if isinstance(v, bool):
+        return f'<c t="b"><v>{int(v)}</v></c>'
+    if isinstance(v, (int, float)):
+        return f"<c><v>{v}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", str(v)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_row(values) -> str:
+    return "<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>"
+
+class _Sink:
+    """
+    Write-only target for ZipFile; drain() hands back what was written.
+    Having no tell()/seek() makes zipfile stream (data descriptors).
+    """
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, b) -> int:
+        self._buf += b
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def drain(self) -> bytes:
+        out = bytes(self._buf)
+        self._buf.clear()
+        return out
+
+def _xlsx_chunks(columns, rows, sheet: str) -> Iterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _xlsx_parts(sheet):
+            zf.writestr(name, xml)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as ws:
+            ws.write((_XML_HEAD + f'<worksheet xmlns="{_NS_MAIN}"><sheetData>'
+                      + _xlsx_row(columns)).encode("utf-8"))
+            for row in rows:
+                ws.write(_xlsx_row(row).encode("utf-8"))
+                if sink.pending() >= EXPORT_CHUNK_BYTES:
+                    yield sink.drain()
+            ws.write(b"</sheetData></worksheet>")
+    yield sink.drain()
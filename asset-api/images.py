@@ -0,0 +1,198 @@
+# images.py
+"""
+Resized variants of uploaded photos.
+
+Every upload gets up to three variants, longest edge in pixels:
+
+    thumb  IMAGE_THUMB_PX  (160)   lists, typeahead, Directory rows
+    card   IMAGE_CARD_PX   (480)   item cards, photo grid
+    full   IMAGE_FULL_PX   (1600)  viewer
+
+They are written as WebP (JPEG when Pillow lacks WebP support or
+IMAGE_FORMAT=jpeg) under <upload dir>/variants/<variant>/, mirroring the
+original's relative path. Orientation from EXIF is applied and all
+metadata (EXIF, GPS, ICC) is dropped. Smaller originals are not scaled up.
+
+Resizing runs in a process pool of IMAGE_WORKERS (2) so a burst of phone
+photos never holds up request threads. Pillow is optional: without it no
+variants are made and the variant URLs serve the original.
+
+Backfill variants for files uploaded before this existed:
+
+    cd asset-api
+    python images.py --backfill          # missing variants only
+    python images.py --backfill --force  # redo everything
+"""
+import os, sys, threading
+from concurrent.futures import Future, ProcessPoolExecutor
+import multiprocessing
+from typing import Dict, Iterator, List, Optional
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:   # optional: variants are skipped
+    Image = None
+
+VARIANTS: Dict[str, int] = {
+    "thumb": int(os.getenv("IMAGE_THUMB_PX", "160")),
+    "card": int(os.getenv("IMAGE_CARD_PX", "480")),
+    "full": int(os.getenv("IMAGE_FULL_PX", "1600")),
+}
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+VARIANT_DIR = "variants"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+def enabled() -> bool:
+    return Image is not None
+
+def output_format() -> str:
+    want = os.getenv("IMAGE_FORMAT", "webp").lower()
+    if want == "webp" and Image is not None and features.check("webp"):
+        return "WEBP"
+    return "JPEG"
+
+def _stem(rel: str) -> str:
+    return os.path.splitext(rel.replace("\\", "/"))[0]
+
+def variant_rel(rel: str, variant: str, fmt: Optional[str] = None) -> str:
+    ext = ".webp" if (fmt or output_format()) == "WEBP" else ".jpg"
+    return f"{VARIANT_DIR}/{variant}/{_stem(rel)}{ext}"
+
+def find_variant(root: str, rel: str, variant: str) -> Optional[str]:
+    """
+    Path of an existing variant file (either format), or None.
+    """
+    for fmt in ("WEBP", "JPEG"):
+        path = os.path.join(root, variant_rel(rel, variant, fmt))
+        if os.path.isfile(path):
+            return path
+    return None
+
+# ---- worker side (runs in the pool processes) ----
+def make_variants(root: str, rel: str, force: bool = False) -> List[str]:
+    """
+    Write the missing variants of <root>/<rel>. Returns the variants written.
+    """
+    if Image is None:
+        return []
+    fmt = output_format()
+    todo = [v for v in VARIANTS if force or find_variant(root, rel, v) is None]
+    if not todo:
+        return []
+    lanczos = getattr(Image, "Resampling", Image).LANCZOS
+    written = []
+    with Image.open(os.path.join(root, rel)) as src:
+        biggest = max(VARIANTS[v] for v in todo)
+        src.draft("RGB", (biggest, biggest))   # JPEG: decode at reduced scale when possible
+        im = ImageOps.exif_transpose(src)
+        alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+        im = im.convert("RGBA" if alpha else "RGB")
+        if alpha and fmt == "JPEG":
+            flat = Image.new("RGB", im.size, (255, 255, 255))
+            flat.paste(im, mask=im.getchannel("A"))
+            im = flat
+        # largest first, each one resized from the previous
+        for v in sorted(todo, key=lambda v: -VARIANTS[v]):
+            edge = VARIANTS[v]
+            im = im.copy()
+            im.thumbnail((edge, edge), lanczos)
+            dest = os.path.join(root, variant_rel(rel, v, fmt))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f"{dest}.{os.getpid()}.tmp"
+            # no exif= / icc_profile= arguments: metadata is not carried over
+            if fmt == "WEBP":
+                im.save(tmp, format="WEBP", quality=IMAGE_QUALITY, method=4)
+            else:
+                im.save(tmp, format="JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp, dest)
+            written.append(v)
+    return written
+
+def remove_variants(root: str, rel: str) -> None:
+    for v in VARIANTS:
+        while True:
+            path = find_variant(root, rel, v)
+            if path is None:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+# ---- API side ----
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads, forking it is not safe
+            _pool = ProcessPoolExecutor(max_workers=max(1, IMAGE_WORKERS),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _report(rel: str):
+    def done(f: Future):
+        e = f.exception()
+        if e is not None:
+            print("IMAGE_VARIANTS_ERROR:", rel, repr(e))
+    return done
+
+def schedule_variants(root: str, rel: str) -> Optional[Future]:
+    """
+    Queue variant generation for a freshly stored upload.
+    """
+    if Image is None:
+        return None
+    f = _get_pool().submit(make_variants, root, rel)
+    f.add_done_callback(_report(rel))
+    return f
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+# ---- backfill ----
+def iter_originals(root: str) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        if dirpath == root:
+            # variants themselves and in-flight uploads (storage.TMP_DIR)
+            dirnames[:] = [d for d in dirnames if d not in (VARIANT_DIR, ".tmp")]
+        for name in filenames:
+            if name.lower().endswith(IMAGE_EXTS):
+                yield os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/")
+
+def backfill(root: str, force: bool = False) -> Dict[str, int]:
+    if Image is None:
+        raise RuntimeError("Pillow is not installed (pip install pillow)")
+    out = {"files": 0, "variants": 0, "errors": 0}
+    pool = _get_pool()
+    try:
+        futures = {pool.submit(make_variants, root, rel, force): rel for rel in iter_originals(root)}
+        for f, rel in futures.items():
+            out["files"] += 1
+            try:
+                out["variants"] += len(f.result())
+            except Exception as e:
+                out["errors"] += 1
+                print("IMAGE_VARIANTS_ERROR:", rel, repr(e))
+    finally:
+        shutdown()
+    return out
+
+def main(argv: List[str]) -> int:
+    root = "uploads"
+    if "--backfill" not in argv:
+        print(__doc__)
+        return 2
+    result = backfill(root, force="--force" in argv)
+    print("backfill:", result, "format:", output_format())
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
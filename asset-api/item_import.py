@@ -0,0 +1,201 @@
+# item_import.py
+"""
+Parsing and row validation for POST /items/bulk.
+
+Input is CSV (header row; data/inventory.csv is one accepted layout) or
+NDJSON (one JSON object per line). Both are read incrementally from the
+uploaded file, so memory holds the validated rows, never the raw text.
+
+Headers / keys are normalized the way the Admin page's CSV importer did
+it (lower-case, spaces -> "_", id / qty / serial / model / dept / type
+aliases). Unknown columns (e.g. "price") are ignored. Blank cells mean
+"not provided": new items get defaults, existing items keep the value.
+"""
+import csv, io, json, os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+
+FIELD_ALIASES = {
+    "id": "item_id",
+    "qty": "quantity",
+    "serial": "serial_no",
+    "model": "model_no",
+    "dept": "department",
+    "type": "category",
+    "item_type": "category",
+}
+
+# field -> max length (None: unbounded text / numeric)
+ITEM_FIELDS: Dict[str, Optional[int]] = {
+    "item_id": 64,
+    "name": 255,
+    "quantity": None,
+    "serial_no": 128,
+    "model_no": 128,
+    "department": 128,
+    "owner": 128,
+    "transfer_from": 128,
+    "transfer_to": 128,
+    "notes": None,
+    "category": 64,
+}
+
+class ImportRow:
+    __slots__ = ("row", "values", "errors", "warnings", "action")
+
+    def __init__(self, row: int, values: Dict[str, Any]):
+        self.row = row            # 1-based line number in the upload
+        self.values = values      # provided fields only
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.action: Optional[str] = None   # "create" | "update"
+
+    @property
+    def item_id(self) -> Optional[str]:
+        return self.values.get("item_id")
+
+    def report(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "row": self.row,
+            "item_id": self.item_id,
+            "action": "error" if self.errors else self.action,
+        }
+        if self.errors:
+            out["errors"] = self.errors
+        if self.warnings:
+            out["warnings"] = self.warnings
+        return out
+
+def detect_format(fmt: Optional[str], filename: Optional[str], content_type: Optional[str]) -> str:
+    if fmt:
+        fmt = fmt.lower()
+        if fmt in ("csv", "ndjson"):
+            return fmt
+        if fmt in ("jsonl", "json-lines"):
+            return "ndjson"
+        raise ValueError("format must be csv or ndjson")
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in ctype or "jsonl" in ctype:
+        return "ndjson"
+    return "csv"
+
+def normalize_category(raw: Any) -> str:
+    # same buckets as the Admin page
+    v = str(raw or "").strip().lower()
+    if v.startswith("desk"):
+        return "Desktop"
+    if v.startswith("lap"):
+        return "Laptop"
+    if v.startswith("prin"):
+        return "Printer"
+    if v.startswith("ups"):
+        return "UPS"
+    return "Other"
+
+def normalize_record(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Canonical field names, blanks dropped; a canonical column wins over an alias.
+    """
+    out: Dict[str, Any] = {}
+    for k, v in raw.items():
+        if k is None:
+            continue   # csv: surplus cells on a long row
+        key = "_".join(str(k).strip().lower().split())
+        canon = FIELD_ALIASES.get(key, key)
+        if canon not in ITEM_FIELDS:
+            continue
+        if isinstance(v, str):
+            v = v.strip()
+        if v is None or v == "":
+            continue
+        if canon in out and key in FIELD_ALIASES:
+            continue
+        out[canon] = v
+    return out
+
+def iter_records(fileobj, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (line number, record) from a binary file object. NDJSON lines
+    that are not JSON objects are yielded as an error string.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for rec in reader:
+                if not any((v or "").strip() for v in rec.values() if isinstance(v, str)):
+                    continue
+                yield reader.line_num, rec
+        else:
+            for n, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError as e:
+                    yield n, f"invalid JSON: {e.msg}"
+                    continue
+                if not isinstance(rec, dict):
+                    yield n, "each line must be a JSON object"
+                    continue
+                yield n, rec
+    finally:
+        text.detach()
+
+def validate_record(line: int, raw: Any) -> ImportRow:
+    """
+    Checks that need no database: types, lengths, required fields.
+    """
+    if isinstance(raw, str):
+        r = ImportRow(line, {})
+        r.errors.append(raw)
+        return r
+    values = normalize_record(raw)
+    r = ImportRow(line, values)
+    for field, max_len in ITEM_FIELDS.items():
+        v = values.get(field)
+        if v is None:
+            continue
+        if field == "quantity":
+            try:
+                q = int(str(v).strip())
+            except ValueError:
+                r.errors.append("quantity must be a whole number")
+                continue
+            if q < 0:
+                r.errors.append("quantity must be >= 0")
+            values[field] = q
+            continue
+        if not isinstance(v, str):
+            v = values[field] = str(v)
+        if max_len is not None and len(v) > max_len:
+            r.errors.append(f"{field} is longer than {max_len} characters")
+    if "category" in values:
+        values["category"] = normalize_category(values["category"])
+    return r
+
+def read_rows(fileobj, fmt: str, max_rows: int = BULK_MAX_ROWS) -> List[ImportRow]:
+    """
+    Parse + validate the whole upload, flagging duplicates inside the file.
+    """
+    rows: List[ImportRow] = []
+    seen_ids: Dict[str, int] = {}
+    seen_serials: Dict[str, int] = {}
+    for line, raw in iter_records(fileobj, fmt):
+        if len(rows) >= max_rows:
+            raise ValueError(f"Too many rows (max {max_rows})")
+        r = validate_record(line, raw)
+        item_id = r.item_id
+        if item_id is not None:
+            first = seen_ids.setdefault(item_id.lower(), r.row)
+            if first != r.row:
+                r.errors.append(f"duplicate item_id (first seen on row {first})")
+        serial = r.values.get("serial_no")
+        if serial is not None:
+            first = seen_serials.setdefault(serial.lower(), r.row)
+            if first != r.row:
+                r.errors.append(f"duplicate serial_no (first seen on row {first})")
+        rows.append(r)
+    return rows
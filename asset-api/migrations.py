@@ -0,0 +1,332 @@
+# migrations.py
+"""
+Versioned schema migrations + optional-column capability map.
+
+Migrations run once, at API startup or from the command line:
+
+    cd asset-api
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show applied version and capabilities
+
+Applied versions are recorded in schema_migrations. Every migration is
+written to be safe on databases that were created from assetvault.sql or
+by older versions of the API (IF NOT EXISTS / index checks), so the first
+run on an existing install just records the baseline.
+
+Older installs differ in a few optional columns (service_records.serviced,
+assignments.item_id / item_serial / item_id_int). Those are detected once
+by load_capabilities(); request handlers ask has_column() and pick their
+SQL up front instead of trying a query and catching "unknown column".
+"""
+import sys, threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+MIGRATION_LOCK_NAME = "assetvault_migrate"
+MIGRATION_LOCK_WAIT = 60
+
+# ---- DDL helpers ----
+def index_exists(conn, table: str, index_name: str) -> bool:
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+            LIMIT 1
+        """, (table, index_name))
+        return cur.fetchone() is not None
+    finally:
+        cur.close()
+
+def column_exists(conn, table: str, column: str) -> bool:
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+            LIMIT 1
+        """, (table, column))
+        return cur.fetchone() is not None
+    finally:
+        cur.close()
+
+def ensure_index(conn, table: str, index_name: str, columns: str, unique: bool = False) -> bool:
+    """
+    CREATE INDEX unless it already exists. Returns True if it was created.
+    """
+    if index_exists(conn, table, index_name):
+        return False
+    cur = conn.cursor()
+    try:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cur.execute(f"CREATE {kind} {index_name} ON {table}({columns})")
+        return True
+    finally:
+        cur.close()
+
+def _execute(conn, *statements: str) -> None:
+    cur = conn.cursor()
+    try:
+        for sql in statements:
+            cur.execute(sql)
+    finally:
+        cur.close()
+
+# ---- migrations ----
+def m001_items_indexes(conn):
+    # list filters: department / owner / status / created_at are already indexed
+    ensure_index(conn, "items", "idx_items_category", "category, created_at")
+    # item_id lookups / joins (service state, assignments, photos)
+    ensure_index(conn, "items", "idx_items_item_id", "item_id")
+
+def m002_service_records(conn):
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS service_records (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            item_id VARCHAR(64) NOT NULL,
+            service_date DATE NOT NULL,
+            serviced TINYINT(1) NOT NULL DEFAULT 1,
+            location VARCHAR(255) NULL,
+            notes TEXT NULL,
+            created_by VARCHAR(100) NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    ensure_index(conn, "service_records", "idx_item", "item_id, service_date")
+
+def m003_change_log(conn):
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS change_log (
+            version BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            table_name VARCHAR(32) NOT NULL,
+            row_key VARCHAR(64) NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_change_table (table_name, version)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """, "DROP TABLE IF EXISTS item_changes")   # items-only predecessor of change_log
+
+def m004_dashboard_rollup(conn):
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS dashboard_rollup (
+            department VARCHAR(128) NOT NULL,
+            category VARCHAR(64) NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            items INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (department, category, status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+def m005_item_service_state(conn):
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS item_service_state (
+            item_id VARCHAR(64) NOT NULL PRIMARY KEY,
+            name VARCHAR(255) NULL,
+            serial_no VARCHAR(128) NULL,
+            department VARCHAR(128) NULL,
+            last_service_date DATE NULL,
+            next_due_date DATE NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            KEY idx_state_due (next_due_date, item_id),
+            KEY idx_state_dept_due (department, next_due_date, item_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+def m006_assignments_item_index(conn):
+    # active-assignment lookups by item (batch assignments lock these rows,
+    # rollups / active_assignment probe them); very old installs lack the column
+    if column_exists(conn, "assignments", "item_id"):
+        ensure_index(conn, "assignments", "idx_asg_item_active_id", "item_id, returned_at")
+
+def m007_entries_indexes(conn):
+    # older dumps declare event as ENUM('assign','transfer','return'), which
+    # rejects the 'service' entries
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'entries' AND COLUMN_NAME = 'event'
+        """)
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    if row and str(row[0]).lower() == "enum":
+        _execute(conn, "ALTER TABLE entries MODIFY event VARCHAR(32) NOT NULL")
+    # /entries keyset order and its item / user filters
+    ensure_index(conn, "entries", "idx_entries_time", "event_time, id")
+    ensure_index(conn, "entries", "idx_entries_item_time", "item_id, event_time")
+    ensure_index(conn, "entries", "idx_entries_user_time", "by_user, event_time")
+
+def m008_assignments_item_time_index(conn):
+    # /items/{item_id}/timeline reads an item's assignments by assigned_at
+    if column_exists(conn, "assignments", "item_id"):
+        ensure_index(conn, "assignments", "idx_asg_item_assigned", "item_id, assigned_at")
+
+def m009_items_item_id_unique(conn):
+    # item_id is the key every endpoint and the resolver look items up by
+    if not index_exists(conn, "items", "uq_items_item_id"):
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT item_id FROM items GROUP BY item_id HAVING COUNT(*) > 1 ORDER BY item_id LIMIT 10
+            """)
+            dupes = [r[0] for r in cur.fetchall()]
+        finally:
+            cur.close()
+        if dupes:
+            raise RuntimeError(
+                "items.item_id has duplicates, resolve them before the unique index can be added: "
+                + ", ".join(dupes)
+            )
+        ensure_index(conn, "items", "uq_items_item_id", "item_id", unique=True)
+    # the plain index from migration 1 is now redundant
+    if index_exists(conn, "items", "idx_items_item_id"):
+        _execute(conn, "DROP INDEX idx_items_item_id ON items")
+
+def m010_item_photos_content_hash(conn):
+    # content-addressed uploads (storage.py): rows per hash = blob reference count
+    if not column_exists(conn, "item_photos", "content_hash"):
+        _execute(conn, "ALTER TABLE item_photos ADD COLUMN content_hash CHAR(64) NULL")
+    ensure_index(conn, "item_photos", "idx_item_photos_hash", "content_hash")
+
+def m011_table_versions(conn):
+    # per-table write stamps for conditional GETs (changes.bump_versions)
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name VARCHAR(32) NOT NULL PRIMARY KEY,
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+# (version, name, fn) — append only; never renumber or edit an applied one
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "items indexes", m001_items_indexes),
+    (2, "service_records", m002_service_records),
+    (3, "change_log", m003_change_log),
+    (4, "dashboard_rollup", m004_dashboard_rollup),
+    (5, "item_service_state", m005_item_service_state),
+    (6, "assignments item index", m006_assignments_item_index),
+    (7, "entries indexes", m007_entries_indexes),
+    (8, "assignments item time index", m008_assignments_item_time_index),
+    (9, "items item_id unique", m009_items_item_id_unique),
+    (10, "item_photos content_hash", m010_item_photos_content_hash),
+    (11, "table_versions", m011_table_versions),
+]
+
+# ---- runner ----
+def _ensure_version_table(conn):
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(128) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    conn.commit()
+
+def applied_versions(conn) -> Set[int]:
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT version FROM schema_migrations")
+        return {int(r[0]) for r in cur.fetchall()}
+    finally:
+        cur.close()
+
+def schema_version(conn) -> int:
+    return max(applied_versions(conn), default=0)
+
+def migrate(conn, log: Callable[..., None] = print) -> List[int]:
+    """
+    Apply pending migrations in order. Returns the versions applied.
+    Serialized across workers with a MySQL named lock.
+    """
+    _ensure_version_table(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_WAIT))
+        if not cur.fetchone()[0]:
+            raise RuntimeError("Timed out waiting for another process to finish migrating")
+        try:
+            done = applied_versions(conn)
+            applied = []
+            for version, name, fn in MIGRATIONS:
+                if version in done:
+                    continue
+                # MySQL DDL commits implicitly; a failed step is simply
+                # retried on the next run (every step is re-runnable)
+                fn(conn)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                conn.commit()
+                log(f"MIGRATION_APPLIED: {version:03d} {name}")
+                applied.append(version)
+            return applied
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+# ---- capabilities ----
+# Optional columns whose presence varies between installs
+OPTIONAL_COLUMNS: Dict[str, List[str]] = {
+    "service_records": ["serviced"],
+    "assignments": ["item_id", "item_serial", "item_id_int"],
+    "item_photos": ["content_hash"],
+    "table_versions": ["version"],
+}
+
+_capabilities: Optional[Dict[str, Set[str]]] = None
+_capabilities_lock = threading.Lock()
+
+def load_capabilities(conn) -> Dict[str, Set[str]]:
+    """
+    Probe OPTIONAL_COLUMNS once (a single INFORMATION_SCHEMA query) and cache.
+    """
+    global _capabilities
+    pairs = [(t, c) for t, cols in OPTIONAL_COLUMNS.items() for c in cols]
+    cur = conn.cursor()
+    try:
+        marks = ",".join(["(%s, %s)"] * len(pairs))
+        cur.execute(f"""
+            SELECT TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND (TABLE_NAME, COLUMN_NAME) IN ({marks})
+        """, tuple(v for p in pairs for v in p))
+        found: Dict[str, Set[str]] = {t: set() for t in OPTIONAL_COLUMNS}
+        for table, column in cur.fetchall():
+            found.setdefault(table, set()).add(column)
+    finally:
+        cur.close()
+    with _capabilities_lock:
+        _capabilities = found
+    return found
+
+def has_column(conn, table: str, column: str) -> bool:
+    """
+    Whether an optional column exists. Loaded on first use if startup
+    could not reach the database.
+    """
+    caps = _capabilities
+    if caps is None:
+        caps = load_capabilities(conn)
+    return column in caps.get(table, ())
+
+def capabilities() -> Dict[str, List[str]]:
+    caps = _capabilities or {}
+    return {t: sorted(cols) for t, cols in caps.items()}
+
+def main(argv: List[str]) -> int:
+    from db import connect_raw
+    conn = connect_raw()
+    try:
+        if "--status" not in argv:
+            migrate(conn)
+        else:
+            _ensure_version_table(conn)
+        pending = [v for v, _, _ in MIGRATIONS if v not in applied_versions(conn)]
+        print("schema version:", schema_version(conn), "pending:", pending or "none")
+        print("capabilities:", {t: sorted(c) for t, c in load_capabilities(conn).items()})
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,101 @@
+# resolver.py
+"""
+In-process item identifier resolver.
+
+Maps item_id, serial_no (both case-insensitive, like the table's collation)
+and the numeric items.id to a small ItemRef. It is filled by the same scan
+and kept current by the same change feed as the item search index (see
+load_item_index / reindex_items in api.py), so it is never more than one
+feed sync behind the database. Callers that are about to write should force
+that sync first; a miss is always confirmed against the database.
+"""
+import threading
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+class ItemRef(NamedTuple):
+    id: int
+    item_id: str
+    serial_no: Optional[str]
+    name: Optional[str]
+    status: Optional[str]
+
+def item_ref(r: Dict[str, Any]) -> ItemRef:
+    return ItemRef(int(r["id"]), r["item_id"], r.get("serial_no"), r.get("name"), r.get("status"))
+
+def _key(v: Optional[str]) -> str:
+    return (v or "").strip().lower()
+
+class ItemResolver:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_item_id: Dict[str, ItemRef] = {}
+        self._by_serial: Dict[str, ItemRef] = {}
+        self._by_pk: Dict[int, ItemRef] = {}
+        self.ready = False
+
+    def __len__(self):
+        return len(self._by_pk)
+
+    # ---- writes ----
+    def rebuild(self, refs: Iterable[ItemRef]) -> None:
+        by_item_id: Dict[str, ItemRef] = {}
+        by_serial: Dict[str, ItemRef] = {}
+        by_pk: Dict[int, ItemRef] = {}
+        for ref in refs:
+            by_pk[ref.id] = ref
+            # duplicate item_ids (installs without the unique index): lowest id wins, like LIMIT 1
+            k = _key(ref.item_id)
+            if k not in by_item_id or ref.id < by_item_id[k].id:
+                by_item_id[k] = ref
+            if ref.serial_no:
+                by_serial[_key(ref.serial_no)] = ref
+        with self._lock:
+            self._by_item_id, self._by_serial, self._by_pk = by_item_id, by_serial, by_pk
+            self.ready = True
+
+    def put(self, ref: ItemRef) -> None:
+        with self._lock:
+            old = self._by_pk.get(ref.id)
+            if old is not None:
+                self._drop(old)
+            self._by_pk[ref.id] = ref
+            self._by_item_id[_key(ref.item_id)] = ref
+            if ref.serial_no:
+                self._by_serial[_key(ref.serial_no)] = ref
+
+    def remove(self, item_id: str) -> None:
+        with self._lock:
+            ref = self._by_item_id.get(_key(item_id))
+            if ref is not None:
+                self._drop(ref)
+                self._by_pk.pop(ref.id, None)
+
+    def _drop(self, ref: ItemRef) -> None:
+        if self._by_item_id.get(_key(ref.item_id)) is ref:
+            del self._by_item_id[_key(ref.item_id)]
+        if ref.serial_no and self._by_serial.get(_key(ref.serial_no)) is ref:
+            del self._by_serial[_key(ref.serial_no)]
+
+    # ---- reads ----
+    def by_item_id(self, item_id: str) -> Optional[ItemRef]:
+        return self._by_item_id.get(_key(item_id))
+
+    def by_serial(self, serial: str) -> Optional[ItemRef]:
+        return self._by_serial.get(_key(serial))
+
+    def by_pk(self, pk: int) -> Optional[ItemRef]:
+        return self._by_pk.get(int(pk))
+
+    def resolve(self, key: str) -> Optional[ItemRef]:
+        """
+        item_id first, then serial_no (what a scanner or a typed key may be).
+        """
+        return self.by_item_id(key) or self.by_serial(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "items": len(self._by_pk),
+            "item_ids": len(self._by_item_id),
+            "serials": len(self._by_serial),
+        }
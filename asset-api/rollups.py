@@ -0,0 +1,199 @@
+# rollups.py
+"""
+Dashboard rollup: item counts per (department, category, status), where
+status is 'in_use' (item has an active assignment) or 'available'.
+
+Writers keep it exact inside their own transaction:
+
+    before = rollup_counts(conn, [item_id])   # locks the item rows
+    ... write items / assignments ...
+    apply_rollup(conn, before, rollup_counts(conn, [item_id]))
+    conn.commit()
+
+rebuild_rollup() recomputes everything from items + assignments, reports
+how many rows had drifted and replaces the table in one transaction. It
+runs at startup when the table is empty and then periodically.
+"""
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+ROLLUP_REBUILD_INTERVAL = float(os.getenv("DASHBOARD_ROLLUP_REBUILD_INTERVAL", "3600"))
+ROLLUP_LOCK_NAME = "assetvault_dashboard_rollup"
+
+RollupKey = Tuple[str, str, str]   # (department, category, status)
+
+# Must agree with dashboard_category() below
+CATEGORY_SQL = """
+    CASE
+        WHEN COALESCE(i.category, '') <> '' THEN i.category
+        WHEN LOWER(i.name) LIKE '%laptop%'   THEN 'Laptop'
+        WHEN LOWER(i.name) LIKE '%desktop%'
+          OR LOWER(i.name) LIKE '%pc%'       THEN 'Desktop'
+        WHEN LOWER(i.name) LIKE '%printer%'  THEN 'Printer'
+        WHEN LOWER(i.name) LIKE '%ups%'      THEN 'UPS'
+        ELSE 'Other'
+    END
+"""
+
+def dashboard_category(name: Any, category: Any) -> str:
+    # prefer the explicit category column; fall back to the name
+    if category is not None and str(category).strip():
+        return str(category)
+    n = str(name or "").lower()
+    if "laptop" in n:
+        return "Laptop"
+    if "desktop" in n or "pc" in n:
+        return "Desktop"
+    if "printer" in n:
+        return "Printer"
+    if "ups" in n:
+        return "UPS"
+    return "Other"
+
+def rollup_counts(conn, item_ids: Iterable[str]) -> Counter:
+    """
+    Rollup keys of the given items as they are right now. The item rows
+    are locked (by primary key) so writers of the same item serialize
+    between their before/after snapshots; anything that still slips
+    through is repaired by the periodic rebuild.
+    """
+    ids = [i for i in dict.fromkeys(item_ids) if i]
+    out: Counter = Counter()
+    if not ids:
+        return out
+    cur = conn.cursor()
+    try:
+        marks = ",".join(["%s"] * len(ids))
+        cur.execute(f"SELECT id FROM items WHERE item_id IN ({marks})", tuple(ids))
+        pks = [int(r[0]) for r in cur.fetchall()]
+        if not pks:
+            return out
+        marks = ",".join(["%s"] * len(pks))
+        cur.execute(f"""
+            SELECT COALESCE(i.department, 'Unassigned'), i.category, i.name,
+                   EXISTS(SELECT 1 FROM assignments a
+                          WHERE a.item_id = i.item_id AND a.returned_at IS NULL)
+            FROM items i
+            WHERE i.id IN ({marks})
+            FOR UPDATE
+        """, tuple(pks))
+        for dept, category, name, used in cur.fetchall():
+            out[(dept, dashboard_category(name, category), "in_use" if used else "available")] += 1
+    finally:
+        cur.close()
+    return out
+
+def apply_rollup(conn, before: Counter, after: Counter) -> None:
+    """
+    Add (after - before) to the rollup. Call inside the write's transaction.
+    """
+    delta = Counter(after)
+    delta.subtract(before)
+    rows = [(d, c, s, n) for (d, c, s), n in delta.items() if n]
+    if not rows:
+        return
+    cur = conn.cursor()
+    try:
+        cur.executemany("""
+            INSERT INTO dashboard_rollup (department, category, status, items)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE items = items + VALUES(items)
+        """, rows)
+    finally:
+        cur.close()
+
+def read_rollup(conn) -> List[Tuple[str, str, str, int]]:
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT department, category, status, items
+            FROM dashboard_rollup
+            WHERE items > 0
+            ORDER BY department, category
+        """)
+        return [(r[0], r[1], r[2], int(r[3])) for r in cur.fetchall()]
+    finally:
+        cur.close()
+
+def _fold(key: RollupKey) -> RollupKey:
+    # the table compares with a case-insensitive, pad-space collation
+    return tuple(str(k).lower().rstrip() for k in key)
+
+def rebuild_rollup(conn) -> Dict[str, int]:
+    """
+    Recompute the rollup from scratch and swap it in.
+    Returns {"rows": ..., "drift": rows that differed from the live table}.
+    """
+    conn.rollback()
+    cur = conn.cursor()
+    try:
+        # lock the rollup first: writers that are mid-transaction finish
+        # (their deltas are in the table and their items are committed)
+        # and new writers wait until the swap commits
+        cur.execute("SELECT department, category, status, items FROM dashboard_rollup FOR UPDATE")
+        live: Counter = Counter()
+        for d, c, s, n in cur.fetchall():
+            live[_fold((d, c, s))] += int(n)
+
+        # GROUP BY by position: bare names would bind to items.category /
+        # items.status before the select aliases
+        cur.execute(f"""
+            SELECT COALESCE(i.department, 'Unassigned'),
+                   {CATEGORY_SQL},
+                   IF(a.item_id IS NULL, 'available', 'in_use'),
+                   COUNT(*)
+            FROM items i
+            LEFT JOIN (
+                SELECT DISTINCT item_id FROM assignments WHERE returned_at IS NULL
+            ) a ON a.item_id = i.item_id
+            GROUP BY 1, 2, 3
+        """)
+        fresh = [(r[0], r[1], r[2], int(r[3])) for r in cur.fetchall()]
+
+        expected: Counter = Counter()
+        for d, c, s, n in fresh:
+            expected[_fold((d, c, s))] += n
+        keys = set(live) | set(expected)
+        drift = sum(1 for k in keys if live.get(k, 0) != expected.get(k, 0))
+
+        cur.execute("DELETE FROM dashboard_rollup")
+        if fresh:
+            cur.executemany("""
+                INSERT INTO dashboard_rollup (department, category, status, items)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE items = items + VALUES(items)
+            """, fresh)
+        conn.commit()
+        return {"rows": len(fresh), "drift": drift}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+def rebuild_rollup_locked(conn, wait: int = 0):
+    """
+    rebuild_rollup() guarded by a server-side named lock so only one
+    worker rebuilds at a time. Returns None if another worker holds it.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, %s)", (ROLLUP_LOCK_NAME, wait))
+        if not cur.fetchone()[0]:
+            return None
+        try:
+            return rebuild_rollup(conn)
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (ROLLUP_LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+def rollup_is_empty(conn) -> bool:
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT 1 FROM dashboard_rollup LIMIT 1")
+        return cur.fetchone() is None
+    finally:
+        cur.close()
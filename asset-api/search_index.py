@@ -0,0 +1,359 @@
+# search_index.py
+"""
+In-process inverted index used for item and people search.
+
+Each document is a dict of text fields. Field values are lower-cased and
+split into alphanumeric tokens; id-like values ("MGT-LAP-001-SN") also get
+a compact token with the separators removed ("mgtlap001sn"). A query
+matches a document when every query token matches some field, by:
+
+  exact token     3 x field weight
+  token prefix    2 x field weight
+  substring       1 x field weight   (3-gram candidates, then verified)
+  fuzzy           similarity x field weight, similarity < 1
+                  (only with fuzzy=True: tokens sharing a padded trigram with
+                  the query token are kept when their trigram similarity is
+                  high enough or they are within a small edit distance, so
+                  "jhon" finds "john" and "smyth" finds "smith")
+
+Results are ranked by total score, then by the document's sort key.
+
+A prefix shared by more than MAX_PREFIX_EXPANSION distinct tokens is not
+expanded token by token: from NGRAM characters on, its documents come from
+the 3-gram candidates instead, a shorter one is checked against the
+documents the query's longer tokens matched. When it is the longest token
+(or the query has no alphanumeric token at all) search() returns None and
+callers answer the query the way they do while the index is cold.
+"""
+import re, bisect, heapq, threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+NGRAM = 3
+MAX_PREFIX_EXPANSION = 512   # distinct tokens a prefix is expanded to one by one
+COMPACT_MAX_LEN = 64
+FUZZY_MIN_SIMILARITY = 0.3
+
+def normalize(text: Any) -> str:
+    return str(text).strip().lower() if text is not None else ""
+
+def tokenize(text: Any) -> List[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+def field_tokens(text: Any) -> Set[str]:
+    toks = tokenize(text)
+    out = set(toks)
+    if len(toks) > 1:
+        compact = "".join(toks)
+        if len(compact) <= COMPACT_MAX_LEN:
+            out.add(compact)
+    return out
+
+def ngrams(token: str, n: int = NGRAM) -> Set[str]:
+    if len(token) < n:
+        return set()
+    return {token[i:i + n] for i in range(len(token) - n + 1)}
+
+def padded_ngrams(token: str, n: int = NGRAM) -> Set[str]:
+    # pad so short tokens and word edges get grams of their own
+    return ngrams(" " * (n - 1) + token + " ", n)
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+def max_edits(token: str) -> int:
+    n = len(token)
+    return 0 if n < 4 else 1 if n < 8 else 2
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (an adjacent swap counts as one edit).
+    Returns limit + 1 as soon as the distance is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+class _FieldIndex:
+    __slots__ = ("postings", "grams", "sorted_tokens", "token_grams")
+
+    def __init__(self, fuzzy: bool = False):
+        self.postings: Dict[str, Set[str]] = {}
+        self.grams: Dict[str, Set[str]] = {}
+        self.sorted_tokens: List[str] = []
+        # padded gram -> distinct tokens containing it (fuzzy matching only)
+        self.token_grams: Optional[Dict[str, Set[str]]] = {} if fuzzy else None
+
+    def add(self, doc_id: str, tokens: Set[str]):
+        for t in tokens:
+            docs = self.postings.get(t)
+            if docs is None:
+                docs = self.postings[t] = set()
+                bisect.insort(self.sorted_tokens, t)
+                if self.token_grams is not None:
+                    for g in padded_ngrams(t):
+                        self.token_grams.setdefault(g, set()).add(t)
+            docs.add(doc_id)
+            for g in ngrams(t):
+                self.grams.setdefault(g, set()).add(doc_id)
+
+    def remove(self, doc_id: str, tokens: Set[str]):
+        for t in tokens:
+            docs = self.postings.get(t)
+            if docs is None:
+                continue
+            docs.discard(doc_id)
+            if not docs:
+                del self.postings[t]
+                i = bisect.bisect_left(self.sorted_tokens, t)
+                if i < len(self.sorted_tokens) and self.sorted_tokens[i] == t:
+                    del self.sorted_tokens[i]
+                if self.token_grams is not None:
+                    for g in padded_ngrams(t):
+                        toks = self.token_grams.get(g)
+                        if toks is not None:
+                            toks.discard(t)
+                            if not toks:
+                                del self.token_grams[g]
+        # grams are shared between tokens of the same doc; recompute the set
+        grams: Set[str] = set()
+        for t in tokens:
+            grams |= ngrams(t)
+        for g in grams:
+            docs = self.grams.get(g)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self.grams[g]
+
+    def prefix_docs(self, prefix: str) -> Optional[Set[str]]:
+        """
+        Documents with a token starting with `prefix`; None when more than
+        MAX_PREFIX_EXPANSION tokens do.
+        """
+        out: Set[str] = set()
+        i = bisect.bisect_left(self.sorted_tokens, prefix)
+        end = min(len(self.sorted_tokens), i + MAX_PREFIX_EXPANSION)
+        while i < end:
+            t = self.sorted_tokens[i]
+            if not t.startswith(prefix):
+                return out
+            out |= self.postings[t]
+            i += 1
+        if i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(prefix):
+            return None
+        return out
+
+    def gram_candidates(self, token: str) -> Set[str]:
+        grams = ngrams(token)
+        if not grams:
+            return set()
+        sets = sorted((self.grams.get(g, set()) for g in grams), key=len)
+        out = set(sets[0])
+        for s in sets[1:]:
+            out &= s
+            if not out:
+                break
+        return out
+
+    def similar_tokens(self, token: str, min_sim: float) -> List[Tuple[str, float]]:
+        """
+        [(indexed token, similarity in (0, 1)), ...] for near misses of `token`.
+        """
+        if not self.token_grams:
+            return []
+        qgrams = padded_ngrams(token)
+        overlap: Dict[str, int] = {}
+        for g in qgrams:
+            for t in self.token_grams.get(g, ()):
+                overlap[t] = overlap.get(t, 0) + 1
+        edits = max_edits(token)
+        out = []
+        for t in overlap:
+            if t == token:
+                continue
+            sim = similarity(qgrams, padded_ngrams(t))
+            if edits:
+                d = edit_distance(token, t, edits)
+                if d <= edits:
+                    sim = max(sim, 1 - d / max(len(token), len(t)))
+            if sim >= min_sim:
+                out.append((t, min(sim, 0.99)))
+        return out
+
+class SearchIndex:
+    """
+    fields:  {field_name: weight}
+    Documents are upserted with put(doc_id, values, sort_key, attrs):
+      values   text per field (missing fields are empty)
+      sort_key tie-breaker for equal scores, ascending (negate for DESC)
+      attrs    arbitrary per-doc data returned to / filtered by callers
+    fuzzy=True also matches misspelt tokens (see module docstring).
+    """
+    def __init__(self, fields: Dict[str, float], fuzzy: bool = False):
+        self.fields = dict(fields)
+        self.fuzzy = fuzzy
+        self._lock = threading.RLock()
+        self._clear()
+        self.ready = False
+
+    def _clear(self):
+        self._fields = {f: _FieldIndex(self.fuzzy) for f in self.fields}
+        self._doc_tokens: Dict[str, Dict[str, Set[str]]] = {}
+        self._sort: Dict[str, Any] = {}
+        self._attrs: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    # ---- writes ----
+    def put(self, doc_id: str, values: Dict[str, Any], sort_key: Any = None,
+            attrs: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._remove(doc_id)
+            toks = {f: field_tokens(values.get(f)) for f in self.fields}
+            for f, t in toks.items():
+                if t:
+                    self._fields[f].add(doc_id, t)
+            self._doc_tokens[doc_id] = toks
+            self._sort[doc_id] = sort_key
+            self._attrs[doc_id] = dict(attrs or {})
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        toks = self._doc_tokens.pop(doc_id, None)
+        if toks is None:
+            return
+        for f, t in toks.items():
+            if t:
+                self._fields[f].remove(doc_id, t)
+        self._sort.pop(doc_id, None)
+        self._attrs.pop(doc_id, None)
+
+    def rebuild(self, docs: Iterable[Tuple[str, Dict[str, Any], Any, Dict[str, Any]]]):
+        """
+        Replace the whole index. docs yields (doc_id, values, sort_key, attrs).
+        Built off to the side so readers keep the old index until the swap.
+        """
+        fresh = SearchIndex(self.fields, self.fuzzy)
+        for doc_id, values, sort_key, attrs in docs:
+            fresh.put(doc_id, values, sort_key, attrs)
+        with self._lock:
+            self._fields = fresh._fields
+            self._doc_tokens = fresh._doc_tokens
+            self._sort = fresh._sort
+            self._attrs = fresh._attrs
+            self.ready = True
+
+    def attrs(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._attrs.get(doc_id)
+
+    # ---- reads ----
+    def scan(self, where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+             after: Any = None, limit: Optional[int] = None) -> Tuple[int, List[str]]:
+        """
+        All documents in sort-key order, no query. `after` is an exclusive
+        lower bound on the sort key (keyset paging).
+        Returns (total matching `where`, [doc_id, ...] for the window).
+        """
+        with self._lock:
+            docs = [(k, d) for d, k in self._sort.items()
+                    if where is None or where(self._attrs[d])]
+        total = len(docs)
+        if after is not None:
+            docs = [kd for kd in docs if kd[0] > after]
+        window = sorted(docs) if limit is None else heapq.nsmallest(limit, docs)
+        return total, [d for _, d in window]
+
+    def _token_scores(self, token: str, fields: List[str],
+                      within: Optional[Iterable[str]] = None) -> Optional[Dict[str, float]]:
+        """
+        Score of every document matching `token`. `within`: the documents
+        that can still match the query (earlier tokens), used to resolve a
+        prefix too broad to expand; None when there is nothing to resolve
+        it with.
+        """
+        scores: Dict[str, float] = {}
+
+        def bump(docs, s):
+            for d in docs:
+                if scores.get(d, 0) < s:
+                    scores[d] = s
+
+        for f in fields:
+            w = self.fields[f]
+            fi = self._fields[f]
+            if self.fuzzy and len(token) >= NGRAM:
+                for t, sim in fi.similar_tokens(token, FUZZY_MIN_SIMILARITY):
+                    bump(fi.postings[t], sim * w)
+            cands: Set[str] = set()
+            if len(token) >= NGRAM:
+                cands = fi.gram_candidates(token)
+                if cands:
+                    bump((d for d in cands
+                          if any(token in t for t in self._doc_tokens[d][f])), 1 * w)
+            prefixed = fi.prefix_docs(token)
+            if prefixed is None:
+                pool = cands if len(token) >= NGRAM else within
+                if pool is None:
+                    return None
+                prefixed = (d for d in pool
+                            if any(t.startswith(token) for t in self._doc_tokens[d][f]))
+            bump(prefixed, 2 * w)
+            bump(fi.postings.get(token, ()), 3 * w)
+        return scores
+
+    def search(self, query: str, fields: Optional[List[str]] = None,
+               where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+               offset: int = 0, limit: Optional[int] = None) -> Optional[Tuple[int, List[Tuple[str, float]]]]:
+        """
+        Returns (total matches, [(doc_id, score), ...] for the requested window),
+        or None when the index cannot answer the query (see module docstring).
+        """
+        qtokens = list(dict.fromkeys(tokenize(query)))
+        if not qtokens:
+            return None
+        use = [f for f in (fields or self.fields) if f in self.fields]
+        with self._lock:
+            total: Optional[Dict[str, float]] = None
+            # rarest-looking (longest) tokens first so the AND shrinks quickly
+            for t in sorted(qtokens, key=len, reverse=True):
+                scores = self._token_scores(t, use, within=total)
+                if scores is None:
+                    return None
+                if total is None:
+                    total = scores
+                else:
+                    total = {d: s + scores[d] for d, s in total.items() if d in scores}
+                if not total:
+                    return 0, []
+            if where is not None:
+                total = {d: s for d, s in total.items() if where(self._attrs[d])}
+            sort = self._sort
+            key = lambda kv: (-kv[1], sort[kv[0]])
+            if limit is None:
+                ranked = sorted(total.items(), key=key)[offset:]
+            else:
+                # top-k only: typeahead asks for 20 out of possibly thousands
+                ranked = heapq.nsmallest(offset + limit, total.items(), key=key)[offset:]
+        return len(total), ranked
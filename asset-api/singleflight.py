@@ -0,0 +1,100 @@
+# singleflight.py
+"""
+Request coalescing for expensive read endpoints.
+
+SingleFlight.do(key, fn) runs fn once for all callers that ask for the same
+key at the same time: the first caller computes, the others wait for its
+result (or its exception). The result is then kept for `ttl` seconds, so a
+burst that arrives just after the computation finished is answered from
+memory too. Keys should contain everything the result depends on
+(endpoint, query parameters, role, and the data version when known).
+
+Per-key counters (requests, executions, coalesced waits, TTL hits, last
+compute time) are exposed via stats().
+"""
+import os, threading, time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+COALESCE_TTL = float(os.getenv("COALESCE_TTL", "2"))
+COALESCE_MAX_KEYS = int(os.getenv("COALESCE_MAX_KEYS", "1000"))
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException = None
+
+class SingleFlight:
+    def __init__(self, ttl: float = COALESCE_TTL, max_keys: int = COALESCE_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _count(self, name: str, field: str, n: float = 1) -> None:
+        st = self._stats.setdefault(name, {"requests": 0, "executions": 0, "coalesced": 0,
+                                           "ttl_hits": 0, "errors": 0, "last_ms": 0.0})
+        st[field] += n
+
+    def do(self, key: Hashable, fn: Callable[[], Any], name: str = "") -> Any:
+        """
+        fn() once per key at a time; `name` groups keys in stats().
+        """
+        name = name or str(key)
+        now = time.monotonic()
+        with self._lock:
+            self._count(name, "requests")
+            hit = self._results.get(key)
+            if hit is not None and hit[0] > now:
+                self._count(name, "ttl_hits")
+                return hit[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._count(name, "coalesced")
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        t0 = time.perf_counter()
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                self._count(name, "executions")
+                self._stats[name]["last_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+                if call.error is not None:
+                    self._count(name, "errors")
+                elif self.ttl > 0:
+                    self._store(key, call.value, time.monotonic() + self.ttl)
+            call.done.set()
+
+    def _store(self, key: Hashable, value: Any, expires: float) -> None:
+        if len(self._results) >= self.max_keys:
+            now = time.monotonic()
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+            if len(self._results) >= self.max_keys:
+                self._results.pop(next(iter(self._results)))
+        self._results[key] = (expires, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ttl": self.ttl, "in_flight": len(self._calls), "cached": len(self._results),
+                    "keys": {k: dict(v) for k, v in self._stats.items()}}
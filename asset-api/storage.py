@@ -0,0 +1,415 @@
+# storage.py
+"""
+Content-addressed photo storage.
+
+Uploads are hashed (SHA-256) while they are streamed to a temp file and
+stored under their hash, sharded two levels deep:
+
+    uploads/3f/a2/3fa2...e9.jpg        served as /uploads/3f/a2/3fa2...e9.jpg
+
+Identical content is stored once. item_photos.content_hash records which
+blob every photo row uses, so the number of rows per hash is the blob's
+reference count (items.photo_url adds the primary photo). Request paths
+never delete blobs: a delete or a rejected upload only drops references,
+and collect_garbage() removes blobs (and their resized variants) that have
+had no reference for STORAGE_GC_GRACE seconds. Reusing a blob refreshes
+its mtime and the GC re-checks the mtime right before each delete, so a
+blob being re-referenced is left alone (see collect_garbage for the limits).
+
+STORAGE_BACKEND=local (default) keeps blobs under UPLOAD_DIR. STORAGE_BACKEND=s3
+stores them in an S3-compatible bucket (MinIO, etc., via boto3; see S3Storage).
+Both implement Storage.
+
+    cd asset-api
+    python storage.py --gc                # collect orphans now
+    python storage.py --migrate-legacy    # move flat uuid files into the sharded layout
+"""
+import hashlib, os, re, sys, tempfile, time
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+STORAGE_GC_GRACE = float(os.getenv("STORAGE_GC_GRACE", "3600"))
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL", "86400"))
+STORAGE_CHUNK = 1024 * 1024
+GC_LOCK_NAME = "assetvault_storage_gc"
+TMP_DIR = ".tmp"
+SKIP_DIRS = {TMP_DIR, "variants"}
+
+_KEY_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]+)?$")
+
+class StoredBlob(NamedTuple):
+    key: str          # path relative to the storage root, "ab/cd/<sha256><ext>"
+    sha256: str
+    size: int
+    created: bool     # False when identical content was already stored
+
+def blob_key(sha256: str, ext: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+def key_hash(key: str) -> Optional[str]:
+    """
+    The content hash of a content-addressed key, None for legacy names.
+    """
+    m = _KEY_RE.match(key or "")
+    return m.group(1) if m else None
+
+class Storage:
+    """
+    Minimal blob store interface used by the photo endpoints.
+    """
+    url_prefix = "/uploads/"
+
+    def put(self, src: BinaryIO, ext: str, chunk_hook: Optional[Callable[[bytes], None]] = None) -> StoredBlob:
+        raise NotImplementedError
+
+    def tmp_dir(self) -> str:
+        """
+        Where uploads are spooled before commit_temp().
+        """
+        raise NotImplementedError
+
+    def commit_temp(self, tmp: str, sha256: str, size: int, ext: str) -> StoredBlob:
+        """
+        Store an already hashed temp file under its hash; the temp file is
+        consumed either way.
+        """
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Filesystem path when the backend has one (resizing, sendfile).
+        """
+        return None
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def mtime(self, key: str) -> Optional[float]:
+        """
+        Current mtime of one blob, None when it is gone.
+        """
+        raise NotImplementedError
+
+    def iter_blobs(self) -> Iterator[Tuple[str, float]]:
+        """
+        (key, mtime) of every stored blob, variants excluded.
+        """
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        return self.url_prefix + key
+
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        if url and url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):]
+        return None
+
+def _spool(src: BinaryIO, tmp_dir: str, chunk_hook) -> Tuple[str, str, int]:
+    """
+    Copy src to a temp file in tmp_dir, hashing on the way.
+    """
+    os.makedirs(tmp_dir, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(STORAGE_CHUNK)
+                if not chunk:
+                    break
+                if chunk_hook is not None:
+                    chunk_hook(chunk)
+                h.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp, h.hexdigest(), size
+
+class LocalStorage(Storage):
+    def __init__(self, root: str = UPLOAD_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, TMP_DIR), exist_ok=True)
+
+    def tmp_dir(self) -> str:
+        return os.path.join(self.root, TMP_DIR)
+
+    def local_path(self, key: str) -> Optional[str]:
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, key))
+        return path if path.startswith(root + os.sep) else None
+
+    def put(self, src, ext, chunk_hook=None) -> StoredBlob:
+        tmp, sha, size = _spool(src, self.tmp_dir(), chunk_hook)
+        return self.commit_temp(tmp, sha, size, ext)
+
+    def commit_temp(self, tmp: str, sha: str, size: int, ext: str) -> StoredBlob:
+        """
+        Move an already hashed temp file into place (or drop it if the
+        content is stored already).
+        """
+        key = blob_key(sha, ext)
+        dest = os.path.join(self.root, key)
+        if os.path.exists(dest):
+            os.remove(tmp)
+            os.utime(dest)   # re-referenced: keep it clear of the GC grace window
+            return StoredBlob(key, sha, size, False)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp, dest)
+        return StoredBlob(key, sha, size, True)
+
+    def open(self, key):
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        return open(path, "rb")
+
+    def exists(self, key):
+        path = self.local_path(key)
+        return path is not None and os.path.isfile(path)
+
+    def delete(self, key):
+        path = self.local_path(key)
+        if path is None:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def mtime(self, key):
+        path = self.local_path(key)
+        try:
+            return os.path.getmtime(path) if path else None
+        except FileNotFoundError:
+            return None
+
+    def iter_blobs(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except FileNotFoundError:
+                    continue
+                yield os.path.relpath(path, self.root).replace(os.sep, "/"), mtime
+
+class S3Storage(Storage):
+    """
+    S3-compatible bucket (AWS, MinIO, ...). Needs boto3. Configured with
+    STORAGE_S3_BUCKET, STORAGE_S3_ENDPOINT (e.g. http://127.0.0.1:9000 for
+    MinIO) and the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY.
+    Uploads are spooled to a local temp file first: the key is the hash.
+    """
+    def __init__(self, bucket: str, endpoint: Optional[str] = None, tmp_dir: Optional[str] = None):
+        import boto3   # optional dependency, only for this backend
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint or None)
+        self._tmp_dir = tmp_dir or os.path.join(tempfile.gettempdir(), "assetvault_uploads")
+
+    def put(self, src, ext, chunk_hook=None) -> StoredBlob:
+        tmp, sha, size = _spool(src, self._tmp_dir, chunk_hook)
+        try:
+            return self.commit_temp(tmp, sha, size, ext)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def commit_temp(self, tmp: str, sha: str, size: int, ext: str) -> StoredBlob:
+        key = blob_key(sha, ext)
+        if self.exists(key):
+            # refresh LastModified so the GC grace window restarts
+            self.client.copy_object(Bucket=self.bucket, Key=key, CopySource={"Bucket": self.bucket, "Key": key},
+                                    MetadataDirective="REPLACE")
+            os.remove(tmp)
+            return StoredBlob(key, sha, size, False)
+        self.client.upload_file(tmp, self.bucket, key)
+        os.remove(tmp)
+        return StoredBlob(key, sha, size, True)
+
+    def tmp_dir(self) -> str:
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        return self._tmp_dir
+
+    def open(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(key)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def mtime(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["LastModified"].timestamp()
+        except Exception:
+            return None
+
+    def iter_blobs(self):
+        pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket)
+        for page in pages:
+            for obj in page.get("Contents", []):
+                if obj["Key"].split("/", 1)[0] not in SKIP_DIRS:
+                    yield obj["Key"], obj["LastModified"].timestamp()
+
+def get_storage() -> Storage:
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(os.environ["STORAGE_S3_BUCKET"], os.getenv("STORAGE_S3_ENDPOINT"))
+    return LocalStorage(UPLOAD_DIR)
+
+# ---- references / garbage collection ----
+def referenced_keys(conn, storage: Storage) -> Set[str]:
+    """
+    Every key a photo row or an item's primary photo points at.
+    """
+    out: Set[str] = set()
+    cur = conn.cursor()
+    try:
+        for sql in ("SELECT DISTINCT photo_url FROM item_photos",
+                    "SELECT DISTINCT photo_url FROM items WHERE photo_url IS NOT NULL"):
+            cur.execute(sql)
+            for (url,) in cur.fetchall():
+                key = storage.key_for_url(url)
+                if key:
+                    out.add(key)
+    finally:
+        cur.close()
+    return out
+
+def collect_garbage(conn, storage: Storage, grace: float = STORAGE_GC_GRACE,
+                    on_delete: Optional[Callable[[str], None]] = None,
+                    log: Callable[..., None] = print) -> Dict[str, int]:
+    """
+    Delete blobs nobody references that are older than `grace` seconds.
+
+    An upload that reuses a stored blob refreshes its mtime (commit_temp)
+    but only inserts its row once the whole body is in, possibly after the
+    listing and the reference read. So every candidate is stat'ed again
+    (a HEAD on S3) right before it is deleted and skipped when it is now
+    younger than the cutoff; the remaining gap is that stat-to-delete call.
+    A reuse whose row lands more than `grace` after commit_temp is not
+    covered: keep the grace well above the longest upload.
+    """
+    out = {"blobs": 0, "deleted": 0, "bytes": 0}
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, 0)", (GC_LOCK_NAME,))
+        if not cur.fetchone()[0]:
+            return out
+        try:
+            cutoff = time.time() - grace
+            candidates = []
+            for key, mtime in storage.iter_blobs():
+                out["blobs"] += 1
+                if mtime < cutoff:
+                    candidates.append(key)
+            refs = referenced_keys(conn, storage)
+            conn.commit()
+            for key in candidates:
+                if key in refs:
+                    continue
+                mtime = storage.mtime(key)
+                if mtime is None or mtime >= cutoff:
+                    continue   # gone, or reused since the listing
+                path = storage.local_path(key)
+                size = os.path.getsize(path) if path and os.path.exists(path) else 0
+                storage.delete(key)
+                if on_delete is not None:
+                    on_delete(key)
+                out["deleted"] += 1
+                out["bytes"] += size
+            if out["deleted"]:
+                log(f"STORAGE_GC: deleted {out['deleted']} of {out['blobs']} blobs ({out['bytes']} bytes)")
+            return out
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (GC_LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+def migrate_legacy(conn, storage: Storage, log: Callable[..., None] = print) -> Dict[str, int]:
+    """
+    Re-store flat uuid-named uploads under their content hash and point
+    item_photos / items at the new URLs. The old files become orphans and
+    are removed by the next collect_garbage() after the grace period.
+    """
+    out = {"files": 0, "rows": 0, "missing": 0}
+    moved: Dict[str, Tuple[str, str]] = {}   # old url -> (new url, hash)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT photo_url FROM item_photos WHERE content_hash IS NULL
+            UNION SELECT photo_url FROM items WHERE photo_url IS NOT NULL
+        """)
+        urls = [r[0] for r in cur.fetchall()]
+        for url in urls:
+            key = storage.key_for_url(url)
+            if not key or key_hash(key):
+                continue
+            try:
+                with storage.open(key) as src:
+                    blob = storage.put(src, os.path.splitext(key)[1].lower() or ".jpg")
+            except FileNotFoundError:
+                out["missing"] += 1
+                continue
+            moved[url] = (storage.url(blob.key), blob.sha256)
+            out["files"] += 1
+        for old, (new, sha) in moved.items():
+            cur.execute("UPDATE item_photos SET photo_url=%s, content_hash=%s WHERE photo_url=%s", (new, sha, old))
+            out["rows"] += cur.rowcount
+            cur.execute("UPDATE items SET photo_url=%s WHERE photo_url=%s", (new, old))
+            out["rows"] += cur.rowcount
+        # rows already on content-addressed URLs but without a hash
+        cur.execute("SELECT id, photo_url FROM item_photos WHERE content_hash IS NULL")
+        for pid, url in cur.fetchall():
+            sha = key_hash(storage.key_for_url(url) or "")
+            if sha:
+                cur.execute("UPDATE item_photos SET content_hash=%s WHERE id=%s", (sha, pid))
+                out["rows"] += 1
+        conn.commit()
+    finally:
+        cur.close()
+    log(f"STORAGE_MIGRATED: {out}")
+    return out
+
+def main(argv: List[str]) -> int:
+    from db import connect_raw
+    storage = get_storage()
+    conn = connect_raw()
+    try:
+        if "--migrate-legacy" in argv:
+            migrate_legacy(conn, storage)
+        if "--gc" in argv:
+            import images
+            root = getattr(storage, "root", None)
+            print("gc:", collect_garbage(
+                conn, storage,
+                on_delete=(lambda key: images.remove_variants(root, key)) if root else None,
+            ))
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,256 @@
+# uploads.py
+"""
+Streaming multipart photo uploads.
+
+receive_photos() reads the request body itself instead of letting the
+framework spool the whole form first, so limits are enforced while bytes
+arrive:
+
+  - Content-Length above UPLOAD_MAX_REQUEST_BYTES is refused before the
+    body is read, and the running total is checked for chunked bodies;
+  - a file larger than UPLOAD_MAX_FILE_BYTES aborts the request as soon as
+    it crosses the limit;
+  - the caller passes how many photos it still accepts, and a file beyond
+    that is refused at its first bytes.
+
+The type comes from the leading bytes (JPEG, PNG, WebP), not from the
+client's Content-Type or file name. Each file is written by its own task,
+in chunks and off the event loop, to a temp file in the storage's temp
+directory while it is hashed, so disk writes overlap with receiving the
+next file. Only when the whole request was accepted, up to the closing
+boundary, are the files moved into place (Storage.commit_temp,
+concurrently); on any error, a truncated body included, every temp file
+is removed and nothing reaches the store.
+"""
+import asyncio, hashlib, os, tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect, Request
+
+from storage import Storage, StoredBlob
+
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(64 * 1024 * 1024)))
+UPLOAD_QUEUE_CHUNKS = 8   # per-file write-behind buffer (chunks of the request stream)
+
+class UploadError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+class TooManyFiles(UploadError):
+    def __init__(self):
+        super().__init__(400, "Too many files")
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """
+    File extension for a supported image, from its first 12 bytes.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+def _write_chunk(f: BinaryIO, h, chunk: bytes) -> None:
+    h.update(chunk)
+    f.write(chunk)
+
+def _finish(f: BinaryIO) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class _FilePart:
+    """
+    One file of the form: sniffed, size-checked, and fed to a writer task.
+    """
+    def __init__(self, tmp_dir: str):
+        self.tmp_dir = tmp_dir
+        self.head = b""
+        self.ext: Optional[str] = None
+        self.skipped = False
+        self.size = 0
+        self.tmp: Optional[str] = None
+        self.sha256 = hashlib.sha256()
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, ext: str) -> None:
+        self.ext = ext
+        fd, self.tmp = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+        os.close(fd)
+        self.queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_CHUNKS)
+        self.task = asyncio.create_task(self._writer())
+
+    async def _writer(self) -> None:
+        f = await run_in_threadpool(open, self.tmp, "wb")
+        try:
+            while True:
+                chunk = await self.queue.get()
+                if chunk is None:
+                    break
+                await run_in_threadpool(_write_chunk, f, self.sha256, chunk)
+            await run_in_threadpool(_finish, f)
+        except BaseException:
+            f.close()
+            raise
+
+    async def close(self) -> None:
+        if self.task is not None:
+            await self.queue.put(None)
+
+    def discard(self) -> None:
+        if self.task is not None:
+            if not self.task.done():
+                self.task.cancel()
+            elif not self.task.cancelled():
+                self.task.exception()   # retrieved: already reported by the caller
+        if self.tmp:
+            _remove(self.tmp)
+
+async def receive_photos(request: Request, storage: Storage, field: str, max_files: int,
+                         max_file_bytes: int = UPLOAD_MAX_FILE_BYTES,
+                         max_request_bytes: int = UPLOAD_MAX_REQUEST_BYTES) -> Tuple[List[StoredBlob], int]:
+    """
+    Store the image files posted under `field`. Returns the stored blobs
+    and how many parts were skipped because they are not images.
+    Raises UploadError (TooManyFiles past max_files).
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError(400, "Expected multipart/form-data")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_request_bytes:
+        raise UploadError(413, f"Upload too large (max {max_request_bytes} bytes per request)")
+    if max_files <= 0:
+        raise TooManyFiles()
+
+    # the parser's callbacks are synchronous: collect events, then act on them
+    events: List[Tuple[str, bytes]] = []
+    header: Dict[str, bytes] = {"field": b"", "value": b""}
+    headers: Dict[bytes, bytes] = {}
+
+    def on_part_begin():
+        headers.clear()
+        events.append(("begin", b""))
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        headers[header["field"].lower()] = header["value"]
+        header["field"] = header["value"] = b""
+
+    def on_headers_finished():
+        events.append(("headers", headers.get(b"content-disposition", b"")))
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", b""))
+
+    def on_end():
+        events.append(("done", b""))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_end": on_end,
+    })
+
+    tmp_dir = storage.tmp_dir()
+    parts: List[_FilePart] = []
+    current: Optional[_FilePart] = None
+    skipped = 0
+    received = 0
+    complete = False
+
+    async def feed(part: _FilePart, data: bytes, final: bool = False) -> None:
+        nonlocal skipped
+        if part.skipped:
+            return
+        if part.ext is None:
+            part.head += data
+            if len(part.head) < 12 and not final:
+                return
+            ext = sniff_image(part.head[:12])
+            if ext is None:
+                part.skipped = True
+                skipped += 1
+                return
+            if sum(1 for p in parts if p.ext) >= max_files:
+                raise TooManyFiles()
+            part.start(ext)
+            data, part.head = part.head, b""
+        part.size += len(data)
+        if part.size > max_file_bytes:
+            raise UploadError(413, f"File too large (max {max_file_bytes} bytes)")
+        if data:
+            await part.queue.put(data)
+
+    try:
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_request_bytes:
+                    raise UploadError(413, f"Upload too large (max {max_request_bytes} bytes per request)")
+                parser.write(chunk)
+                for kind, value in events:
+                    if kind == "headers":
+                        _, disp = parse_options_header(value)
+                        if disp.get(b"name", b"").decode("latin-1") == field and b"filename" in disp:
+                            current = _FilePart(tmp_dir)
+                            parts.append(current)
+                    elif kind == "data" and current is not None:
+                        await feed(current, value)
+                    elif kind == "end" and current is not None:
+                        await feed(current, b"", final=True)
+                        await current.close()
+                        current = None
+                    elif kind == "done":
+                        complete = True
+                events.clear()
+                # a writer that failed (disk full, ...) stops the upload early
+                for p in parts:
+                    if p.task is not None and p.task.done() and p.task.exception():
+                        raise p.task.exception()
+            parser.finalize()
+        except ClientDisconnect:
+            raise UploadError(400, "Upload interrupted")
+        # finalize() does not check that the closing boundary arrived; without
+        # it the open part's writer would wait for more data forever
+        if not complete or current is not None:
+            raise UploadError(400, "Upload interrupted")
+
+        stored = [p for p in parts if p.task is not None]
+        await asyncio.gather(*(p.task for p in stored))
+        blobs = await asyncio.gather(*(
+            run_in_threadpool(storage.commit_temp, p.tmp, p.sha256.hexdigest(), p.size, p.ext)
+            for p in stored
+        ))
+        return list(blobs), skipped
+    except BaseException:
+        for p in parts:
+            p.discard()
+        raise
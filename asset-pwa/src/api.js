@@ -27,8 +27,11 @@ export async function login(username, password) {
 export const me = () => api.get("/auth/me");
 
 // ---- Items (Serial-first) ----
-export const listItems = () => api.get("/items");
-export const searchItems = (q) => api.get("/items/search", { params: { q } });
+// params: { limit, cursor, department, category, status, owner, created_from, created_to }
+// With limit/cursor the server pages with keyset cursors (X-Next-Cursor / X-Total-Count headers).
+export const listItems = (params = {}) => api.get("/items", { params });
+export const searchItems = (q, params = {}) =>
+  api.get("/items/search", { params: { q, ...params } });
 
 // Create: pass a plain object, we build FormData
 export function createItem(obj) {
@@ -39,8 +42,17 @@ export function createItem(obj) {
   return api.post("/items", fd);
 }
 
-export const getItemBySerial = (serial) =>
-  api.get(`/items/by-serial/${encodeURIComponent(serial)}`);
+// Bulk create/update from a CSV or NDJSON file (matched on item_id).
+// params: { format, dry_run, on_error: "abort" | "skip" } → per-row report
+export function bulkImportItems(file, params = {}) {
+  const fd = new FormData();
+  fd.append("file", file);
+  return api.post("/items/bulk", fd, { params });
+}
+
+// include: "photos,holder,service_status,recent_entries" (any subset)
+export const getItemBySerial = (serial, include) =>
+  api.get(`/items/by-serial/${encodeURIComponent(serial)}`, { params: { include } });
 export const updateItem = (id, patch) =>
   api.put(`/items/${encodeURIComponent(id)}`, patch);
 export const updateItemBySerial = (serial, patch) =>
@@ -66,6 +78,10 @@ export const listPhotos = (itemId) =>
 export const deletePhoto = (itemId, photoId) =>
   api.delete(`/items/${encodeURIComponent(itemId)}/photos/${photoId}`);
 
+// params: { types: "assignment,entry,service", limit, cursor }
+export const getItemTimeline = (itemId, params = {}) =>
+  api.get(`/items/${encodeURIComponent(itemId)}/timeline`, { params });
+
 // ---- People/Departments ----
 export const listDepartments = () => api.get("/departments");
 export const listPeople = (params = {}) =>
@@ -110,8 +126,9 @@ export const deleteUser = (username) =>
   api.delete(`/users/${encodeURIComponent(username)}`);
 
 // ---- Entries ----
-export const listEntries = (limit = 200) =>
-  api.get(`/entries`, { params: { limit } });
+// filters: { item_id, by_user, event, date_from, date_to }
+export const listEntries = (limit = 200, cursor, filters = {}) =>
+  api.get(`/entries`, { params: { limit, cursor, ...filters } });
 
 // ---- Service records ----
 export const listServiceRecords = (itemId) =>
@@ -123,8 +140,9 @@ export const addServiceRecord = (itemId, payload) =>
 export const getServiceStatus = (itemId) =>
   api.get(`/items/${encodeURIComponent(itemId)}/service-status`);
 
-export const listServiceOverview = () =>
-  api.get(`/services/overview`);
+// params: { status, due_within, department, item_id, limit, cursor } (all optional)
+export const listServiceOverview = (params = {}) =>
+  api.get(`/services/overview`, { params });
 
 // ---- Dashboard ----
 export const getDashboardSummary = () =>
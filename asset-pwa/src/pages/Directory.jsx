@@ -10,7 +10,11 @@ import {
 } from "../api";
 import FancySelect from "../ui/FancySelect.jsx";
 import errorText from "../ui/errorText";
-import { usePagination, PaginationControls } from "../ui/pagination";
+import {
+  usePagination,
+  useCursorPagination,
+  PaginationControls,
+} from "../ui/pagination";
 
 function cls(...c) {
   return c.filter(Boolean).join(" ");
@@ -119,31 +123,12 @@ export default function DirectoryPage() {
     }
   };
 
-  // ---- Items (read-only with search + pagination) ----
+  // ---- Items (read-only with search + server-side pagination) ----
   const [iQ, setIQ] = useState("");
-  const [iRows, setIRows] = useState([]);
-  const [iLoading, setILoading] = useState(false);
-
-  const fetchItems = async (q) => {
-    setILoading(true);
-    try {
-      const { data } =
-        q && q.length >= 2 ? await searchItems(q) : await listItems();
-      setIRows(data);
-    } catch {
-      /* ignore */
-    } finally {
-      setILoading(false);
-    }
-  };
+  const [iQuery, setIQuery] = useState("");
 
   useEffect(() => {
-    // initial load
-    fetchItems("");
-  }, []);
-
-  useEffect(() => {
-    const t = setTimeout(() => fetchItems(iQ), 250);
+    const t = setTimeout(() => setIQuery(iQ.length >= 2 ? iQ : ""), 250);
     return () => clearTimeout(t);
   }, [iQ]);
 
@@ -156,7 +141,16 @@ export default function DirectoryPage() {
     rows: pagedItems,
     next: iNext,
     prev: iPrev,
-  } = usePagination(iRows, 10);
+    loading: iLoading,
+  } = useCursorPagination(
+    // the grid only shows these, so the server skips the other columns and photos
+    (params) =>
+      iQuery
+        ? searchItems(iQuery, params)
+        : listItems({ ...params, fields: "item_id,name,quantity" }),
+    [iQuery],
+    10
+  );
 
   return (
     <div className="page">
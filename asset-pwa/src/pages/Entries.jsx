@@ -8,6 +8,8 @@ export default function EntriesPage() {
   const [loading, setLoading] = useState(true);
   const [err, setErr] = useState("");
   const [search, setSearch] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // pagination state
   const [page, setPage] = useState(1);
@@ -19,8 +21,11 @@ export default function EntriesPage() {
       setLoading(true);
       setErr("");
       try {
-        const { data } = await listEntries(500); // fetch up to 500 latest
-        if (on) setRows(data || []);
+        const res = await listEntries(200); // newest page; older via "Load older"
+        if (on) {
+          setRows(res.data || []);
+          setNextCursor(res.headers["x-next-cursor"] || null);
+        }
       } catch (e) {
         if (on) setErr(errorText(e, "Failed to load entries"));
       } finally {
@@ -32,6 +37,21 @@ export default function EntriesPage() {
     };
   }, []);
 
+  async function loadOlder() {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    setErr("");
+    try {
+      const res = await listEntries(200, nextCursor);
+      setRows((prev) => prev.concat(res.data || []));
+      setNextCursor(res.headers["x-next-cursor"] || null);
+    } catch (e) {
+      setErr(errorText(e, "Failed to load entries"));
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   const filtered = useMemo(() => {
     const needle = (search || "").toLowerCase().trim();
     if (!needle) return rows;
@@ -54,7 +74,7 @@ export default function EntriesPage() {
   // reset to first page on filter change
   useEffect(() => {
     setPage(1);
-  }, [search, rows.length]);
+  }, [search]);
 
   const totalPages = Math.max(1, Math.ceil((filtered.length || 0) / pageSize));
 
@@ -155,6 +175,16 @@ export default function EntriesPage() {
                   </select>
                 </div>
                 <div className="row" style={{ gap: 8, alignItems: "center" }}>
+                  {nextCursor && (
+                    <button
+                      type="button"
+                      className="btn ghost"
+                      disabled={loadingMore}
+                      onClick={loadOlder}
+                    >
+                      {loadingMore ? "Loading…" : "Load older"}
+                    </button>
+                  )}
                   <span className="muted">
                     Page {page} of {totalPages}
                   </span>
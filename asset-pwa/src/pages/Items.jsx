@@ -11,6 +11,7 @@ import {
   searchItemsLite,
   transferAssignment,
   getActiveAssignment,
+  getItemBySerial,
 } from "../api";
 import errorText from "../ui/errorText";
 import FancySelect from "../ui/FancySelect.jsx";
@@ -93,6 +94,13 @@ export default function ItemsPage() {
 
   async function resolveItemBySerial(serialNo) {
     if (!serialNo) return null;
+    try {
+      // exact serial: item and current holder in one call
+      const { data } = await getItemBySerial(serialNo, "holder");
+      return { item_id: data.item_id, name: data.name, holder: data.holder || null };
+    } catch (e) {
+      if (e?.response?.status !== 404) throw e;
+    }
     const { data } = await searchItems(serialNo);
     const exact = data.find(x => (x.serial_no || "").toLowerCase() === serialNo.toLowerCase());
     if (exact) return { item_id: exact.item_id, name: exact.name };
@@ -184,7 +192,9 @@ export default function ItemsPage() {
       try {
         const found = await resolveItemBySerial(tSerial.trim());
         setTItemResolved(found);
-        if (found) {
+        if (found && found.holder !== undefined) {
+          setTFromResolvedLabel(found.holder?.person_name || "");
+        } else if (found) {
           const { data } = await getActiveAssignment(found.item_id);
           setTFromResolvedLabel(data?.person_name || "");
         } else {
@@ -337,7 +347,7 @@ export default function ItemsPage() {
             <div className="photo-grid">
               {photos.map(p => (
                 <div key={p.id} className="photo-tile">
-                  <img src={p.photo_url} alt="" />
+                  <img src={p.card_url || p.photo_url} alt="" loading="lazy" />
                   <button className="icon danger" onClick={()=>onDeletePhoto(p.id)}>✕</button>
                 </div>
               ))}
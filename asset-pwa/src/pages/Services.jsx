@@ -181,8 +181,18 @@ export default function ServicesPage() {
         loadData(picked.item_id),
         (async () => {
           try {
-            const { data } = await listServiceOverview();
-            setOverview(data || []);
+            // only this item's row changed
+            const { data } = await listServiceOverview({ item_id: picked.item_id });
+            const row = (data || [])[0];
+            if (row) {
+              setOverview((prev) => {
+                const i = prev.findIndex((r) => r.item_id === row.item_id);
+                if (i < 0) return [...prev, row];
+                const copy = prev.slice();
+                copy[i] = row;
+                return copy;
+              });
+            }
           } catch {
             // ignore
           }
@@ -11,6 +11,7 @@ import {
   deletePerson,
   listItems,
   createItem,
+  bulkImportItems,
   updateItem,
   deleteItem,
   listUsers,
@@ -536,51 +537,25 @@ export default function AdminPage() {
     if (!file) return;
     setBusy(true);
     try {
-      const text = await file.text();
-      const rows = parseCsv(text);
-      let ok = 0;
-      let fail = 0;
-
-      for (const row of rows) {
-        const name = row.name || "";
-        if (!name) {
-          fail++;
-          continue;
-        }
-        const qraw = row.quantity || row.qty || "0";
-        const quantity = parseInt(qraw, 10) || 0;
-
-        const rawCat = row.category || row.type || row.item_type || "";
-        const category = normalizeCategory(rawCat);
-
-        const rest = {
-          item_id: row.item_id || row.id || "", // use CSV id if present
-          name,
-          quantity,
-          serial_no: row.serial_no || row.serial || "",
-          model_no: row.model_no || row.model || "",
-          department: row.department || row.dept || "",
-          owner: row.owner || "",
-          notes: row.notes || "",
-          category,
-        };
-
-        try {
-          await createItemWithAutoId(rest);
-          ok++;
-        } catch (e) {
-          console.error("Failed to import item row", row, e);
-          fail++;
-        }
-      }
+      // server parses, validates and upserts in one transaction;
+      // "skip" keeps the old behaviour of importing the rows that are valid
+      const { data } = await bulkImportItems(file, { on_error: "skip" });
+      const ok = data.created + data.updated;
+      const failed = data.results.filter((r) => r.action === "error");
+      failed.forEach((r) =>
+        console.error("Failed to import item row", r.row, r.errors)
+      );
 
       await refresh();
-      if (fail) {
+      if (failed.length) {
+        const first = failed[0];
         setErr(
-          `CSV import for items: ${ok} rows imported, ${fail} failed. Check the data for missing required fields.`
+          `CSV import for items: ${ok} rows imported (${data.created} new, ${data.updated} updated), ${failed.length} failed. Row ${first.row}: ${first.errors.join("; ")}`
         );
       } else {
-        setErr(`CSV import for items: ${ok} rows imported successfully.`);
+        setErr(
+          `CSV import for items: ${ok} rows imported successfully (${data.created} new, ${data.updated} updated).`
+        );
       }
     } catch (e) {
       setErr(errorText(e, "Failed to import items CSV"));
@@ -1,5 +1,5 @@
 // src/ui/pagination.jsx
-import { useEffect, useMemo, useState } from "react";
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 
 /**
  * Generic client-side pagination hook.
@@ -47,6 +47,76 @@ export function usePagination(allRows, initialPageSize = 15) {
   };
 }
 
+/**
+ * Server-side (keyset) pagination hook.
+ * - fetchPage({ limit, cursor }) must return an axios response whose
+ *   headers carry x-next-cursor / x-total-count
+ * - deps: re-start from page 1 whenever these change (search text, filters)
+ * Returns the same shape as usePagination so PaginationControls works unchanged.
+ */
+export function useCursorPagination(fetchPage, deps = [], initialPageSize = 15) {
+  const [page, setPage] = useState(1);
+  const [pageSize, setPageSizeState] = useState(initialPageSize);
+  const [rows, setRows] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+  // cursors[i] = cursor that loads page i + 1 (page 1 has none)
+  const cursors = useRef([null]);
+  const fetchRef = useRef(fetchPage);
+  fetchRef.current = fetchPage;
+
+  const load = useCallback(
+    async (pageNo, size) => {
+      setLoading(true);
+      try {
+        const res = await fetchRef.current({
+          limit: size,
+          cursor: cursors.current[pageNo - 1] || undefined,
+        });
+        const next = res.headers?.["x-next-cursor"] || null;
+        cursors.current[pageNo] = next;
+        setRows(res.data || []);
+        setNextCursor(next);
+        setTotal(Number(res.headers?.["x-total-count"]) || (res.data || []).length);
+        setPage(pageNo);
+      } catch {
+        /* keep previous page */
+      } finally {
+        setLoading(false);
+      }
+    },
+    []
+  );
+
+  useEffect(() => {
+    cursors.current = [null];
+    load(1, pageSize);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [...deps, pageSize]);
+
+  // total is approximate; never let it hide a next page the server reported
+  const pageCount = nextCursor
+    ? Math.max(page + 1, Math.ceil(total / pageSize))
+    : page;
+
+  const setPageSize = (newSize) => setPageSizeState(Number(newSize) || initialPageSize);
+  const next = () => nextCursor && load(page + 1, pageSize);
+  const prev = () => page > 1 && load(page - 1, pageSize);
+
+  return {
+    page,
+    pageSize,
+    setPageSize,
+    pageCount,
+    total,
+    rows,
+    next,
+    prev,
+    loading,
+  };
+}
+
 /**
  * PaginationControls – standard footer with:
  * - Rows per page select